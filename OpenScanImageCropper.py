@@ -4,26 +4,28 @@ from tkinter import ttk
 import cv2
 import numpy as np
 import os
-import glob
-import json
 import threading
+import queue
+import math
+import time
+from collections import deque
+import multiprocessing
 from PIL import Image, ImageTk
-
-SETTINGS_FILE = "settings.json"
-
-def load_settings():
-    if os.path.exists(SETTINGS_FILE):
-        try:
-            with open(SETTINGS_FILE, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            print(e)
-            return {}
-    return {}
-
-def save_settings(settings):
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f)
+from crop_core import (DEFAULT_SETTINGS, OUTPUT_FORMATS, THRESHOLD_MODES, load_settings, save_settings,
+                       list_images, crop_options, process_image, auto_threshold)
+from crop_pipeline import make_processor
+from run_stats import RunStats
+from image_cache import ImageCache, Prefetcher, DetectionWorker
+from brightness_index import find_darkest
+from watch_folder import FolderWatcher
+from job_queue import JobQueue, JobRunner, FINISHED, describe
+
+try:
+    LANCZOS = Image.Resampling.LANCZOS
+    BILINEAR = Image.Resampling.BILINEAR
+except AttributeError:
+    LANCZOS = Image.LANCZOS
+    BILINEAR = Image.BILINEAR
 
 class OpenScanImageCropper(tk.Tk):
     def __init__(self):
@@ -32,20 +34,29 @@ class OpenScanImageCropper(tk.Tk):
         # Increase window size to show all controls comfortably.
         self.geometry("800x1200")
         self.settings = load_settings()
-        self.settings.setdefault("input_folder", "")
-        self.settings.setdefault("output_folder", "")
-        self.settings.setdefault("threshold", 200)
-        self.settings.setdefault("margin", 30)
-        self.settings.setdefault("custom_prefix", "")
-        self.settings.setdefault("output_format", "Original")
+        for key, value in DEFAULT_SETTINGS.items():
+            self.settings.setdefault(key, value)
         self.last_input_folder = self.settings.get("input_folder", "")
         self.last_output_folder = self.settings.get("output_folder", "")
         
         self.image_list = []      # List of image file paths.
         self.current_index = 0
         self.sample_image = None  # Loaded image (NumPy array).
+        self.sample_gray = None  # Grayscale plane of sample_image.
+        self.sample_path = None
+        # Decoded images and detection results, shared across navigation and slider moves.
+        self.image_cache = ImageCache(self.settings["cache_mb"])
+        self.prefetcher = Prefetcher(self.image_cache, self.settings["prefetch_radius"])
+        # Slider changes are detected on this worker and drawn as a canvas overlay.
+        self.detection_worker = DetectionWorker(self.image_cache)
+        self.detection_poll_job = None
+        self.crop_box = None  # (x, y, x2, y2) in image pixels for the current threshold/margin.
         self.current_preview_pil = None  # PIL image for preview.
         self.preview_photo = None  # PhotoImage for canvas.
+        self.pyramid = []  # current_preview_pil halved repeatedly, for zoomed-out views.
+        self.rendered_bounds = None  # Canvas rect covered by preview_photo when it was rendered.
+        self.rendered_pan = (0, 0)  # Pan offsets at render time; drags just move the item by the difference.
+        self.settle_job = None  # Pending high-quality re-render after panning/zooming stops.
         self.zoom_factor = 1.0
         # Pan offsets.
         self.pan_x = 0
@@ -67,12 +78,26 @@ class OpenScanImageCropper(tk.Tk):
         self.canvas_width = 600
         self.canvas_height = 400
 
+        # Batch results are posted here by the worker thread and drained on the Tk main loop.
+        self.batch_queue = queue.Queue()
+        self.batch_thread = None
+        self.result_times = deque(maxlen=50)  # Completion times of recent results, for images/s and ETA.
+        self.watch_stop = None  # Set to stop watch mode; None when not watching.
+        self.job_queue = JobQueue()
+        self.job_stop = None  # Set to stop the job queue runner; None when it is not running.
+        self.job_window = None
+        self.job_listbox = None
+        self.job_jobs = []  # Jobs as shown in job_listbox, by row.
+
         # Build GUI.
         tk.Label(self, text="Input Folder:").pack(pady=(10, 0))
         self.input_folder_entry = tk.Entry(self, width=60)
         self.input_folder_entry.pack(pady=(0, 5))
         self.input_folder_entry.insert(0, self.settings["input_folder"])
         tk.Button(self, text="Browse Input Folder", command=self.browse_input_folder).pack()
+        self.recursive_var = tk.BooleanVar(self, value=self.settings["recursive"])
+        tk.Checkbutton(self, text="Include Subfolders", variable=self.recursive_var,
+                       command=self.toggle_recursive).pack()
 
         tk.Label(self, text="Output Folder:").pack(pady=(10, 0))
         self.output_folder_entry = tk.Entry(self, width=60)
@@ -88,13 +113,23 @@ class OpenScanImageCropper(tk.Tk):
         tk.Label(self, text="Output Format:").pack(pady=(10, 0))
         self.output_format_var = tk.StringVar(self)
         self.output_format_var.set(self.settings["output_format"])  # Options: Original, TIFF, PNG, JPG.
-        formats = ["Original", "TIFF", "PNG", "JPG"]
-        tk.OptionMenu(self, self.output_format_var, *formats).pack(pady=(0, 5))
+        tk.OptionMenu(self, self.output_format_var, *OUTPUT_FORMATS).pack(pady=(0, 5))
 
         tk.Label(self, text="Brightness Threshold (0-255):").pack(pady=(10, 0))
         self.threshold_scale = tk.Scale(self, from_=0, to=255, orient="horizontal", command=self.update_preview)
         self.threshold_scale.set(self.settings["threshold"])
         self.threshold_scale.pack()
+        threshold_mode_frame = tk.Frame(self)
+        threshold_mode_frame.pack()
+        tk.Label(threshold_mode_frame, text="Threshold Mode:").grid(row=0, column=0)
+        self.threshold_mode_var = tk.StringVar(self)
+        self.threshold_mode_var.set(self.settings["threshold_mode"])  # Automatic modes pick a threshold per image.
+        tk.OptionMenu(threshold_mode_frame, self.threshold_mode_var, *THRESHOLD_MODES,
+                      command=self.change_threshold_mode).grid(row=0, column=1, padx=5)
+        self.auto_threshold_label = tk.Label(threshold_mode_frame, text="", width=22, anchor="w")
+        self.auto_threshold_label.grid(row=0, column=2)
+        if self.settings["threshold_mode"] != "manual":
+            self.threshold_scale.config(state="disabled")
 
         tk.Label(self, text="Margin (px):").pack(pady=(10, 0))
         self.margin_scale = tk.Scale(self, from_=0, to=100, orient="horizontal", command=self.update_preview)
@@ -128,10 +163,20 @@ class OpenScanImageCropper(tk.Tk):
         tk.Button(proc_frame, text="Process Current Image", command=self.process_current_image).grid(row=0, column=1, padx=10)
         tk.Button(proc_frame, text="Select Region for Threshold", command=self.activate_selection_mode).grid(row=0, column=2, padx=10)
         tk.Button(proc_frame, text="Load Darkest Image for Threshold", command=self.load_darkest_image_for_threshold).grid(row=0, column=3, padx=10)
+        self.watch_button = tk.Button(proc_frame, text="Watch Input Folder", command=self.toggle_watch)
+        self.watch_button.grid(row=1, column=0, columnspan=2, pady=(10, 0))
+        tk.Button(proc_frame, text="Add to Job Queue", command=self.add_job).grid(row=1, column=2, pady=(10, 0))
+        tk.Button(proc_frame, text="Job Queue...", command=self.open_job_window).grid(row=1, column=3, pady=(10, 0))
 
         # Progress bar.
-        self.progress_bar = ttk.Progressbar(self, orient="horizontal", length=750, mode="determinate")
-        self.progress_bar.pack(pady=10)
+        progress_frame = tk.Frame(self)
+        progress_frame.pack(pady=10)
+        self.progress_bar = ttk.Progressbar(progress_frame, orient="horizontal", length=600, mode="determinate")
+        self.progress_bar.grid(row=0, column=0)
+        self.rate_label = tk.Label(progress_frame, text="", width=22, anchor="w", font=("Helvetica", 9))
+        self.rate_label.grid(row=0, column=1, padx=(10, 0))
+        self.status_label = tk.Label(self, text="", font=("Helvetica", 9))
+        self.status_label.pack()
 
         # Instructions.
         instructions = ("Instructions:\n"
@@ -156,17 +201,25 @@ class OpenScanImageCropper(tk.Tk):
             self.settings["input_folder"] = folder
             self.load_input_folder(folder)
 
+    def toggle_recursive(self):
+        self.settings["recursive"] = self.recursive_var.get()
+        if self.input_folder_entry.get():
+            self.load_input_folder(self.input_folder_entry.get())
+
+    def list_input_images(self, folder):
+        # The one listing behind browsing, the darkest-image scan and batches (cached, so cheap to repeat).
+        return list_images(folder, self.settings["recursive"], [self.output_folder_entry.get()])
+
     def load_input_folder(self, folder):
-        # Updated to include TIFF, JPG, JPEG, PNG.
-        extensions = ["*.tif", "*.tiff", "*.jpg", "*.jpeg", "*.png"]
-        image_paths = []
-        for ext in extensions:
-            image_paths.extend(glob.glob(os.path.join(folder, ext)))
-        image_paths = sorted(image_paths)
+        image_paths = self.list_input_images(folder)
         if not image_paths:
             messagebox.showinfo("No Images Found", "No image files found in the selected input folder.")
+            self.prefetcher.cancel()
             self.image_list = []
             self.sample_image = None
+            self.sample_gray = None
+            self.sample_path = None
+            self.crop_box = None
             self.preview_canvas.delete("all")
             self.filename_label.config(text="Filename: None")
         else:
@@ -189,10 +242,17 @@ class OpenScanImageCropper(tk.Tk):
         if self.current_index < 0 or self.current_index >= len(self.image_list):
             return
         image_path = self.image_list[self.current_index]
-        self.sample_image = cv2.imread(image_path)
-        if self.sample_image is None:
+        entry = self.image_cache.load(image_path)
+        if entry is None:
             messagebox.showerror("Error", f"Could not load image: {image_path}")
             return
+        self.sample_image, self.sample_gray = entry
+        self.sample_path = image_path
+        if self.settings["strip_mb"]:
+            # Strip mode is for scans too large to hold several at once; don't decode neighbours.
+            self.prefetcher.cancel()
+        else:
+            self.prefetcher.schedule(self.image_list, self.current_index)
         if reset_zoom:
             img_height, img_width = self.sample_image.shape[:2]
             scale = min(1.0, self.canvas_width / img_width, self.canvas_height / img_height)
@@ -200,55 +260,144 @@ class OpenScanImageCropper(tk.Tk):
             self.pan_x = 0
             self.pan_y = 0
         self.filename_label.config(text=f"Filename: {os.path.basename(image_path)}")
+        self.show_sample_image()
         self.update_preview()
 
+    def show_sample_image(self):
+        # The frame is rasterised once per image; the crop box is drawn on top as a canvas item.
+        if len(self.sample_image.shape) == 2:
+            image_rgb = cv2.cvtColor(self.sample_image, cv2.COLOR_GRAY2RGB)
+        else:
+            image_rgb = cv2.cvtColor(self.sample_image, cv2.COLOR_BGR2RGB)
+        self.current_preview_pil = Image.fromarray(image_rgb)
+        self.crop_box = None
+        self.build_pyramid()
+        self.update_canvas_image()
+
+    def change_threshold_mode(self, mode):
+        self.settings["threshold_mode"] = mode
+        self.threshold_scale.config(state="normal" if mode == "manual" else "disabled")
+        self.auto_threshold_label.config(text="")
+        self.update_preview()
+
+    def preview_threshold(self):
+        # Threshold the batch would use for the shown image.
+        mode = self.settings["threshold_mode"]
+        if mode == "manual":
+            return self.threshold_scale.get()
+        value = auto_threshold(self.sample_gray, mode, self.settings["threshold_percentile"])
+        self.auto_threshold_label.config(text=f"This image: {value}")
+        return value
+
     def update_preview(self, event=None):
+        # Slider callback: hand the newest threshold/margin to the detection worker.
         if self.sample_image is None:
             return
-        brightness_threshold = self.threshold_scale.get()
-        margin = self.margin_scale.get()
-        image = self.sample_image.copy()
-        if len(image.shape) == 2:
-            gray = image
-            image_color = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
-        else:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            image_color = image
-        _, thresh = cv2.threshold(gray, brightness_threshold, 255, cv2.THRESH_BINARY)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if contours:
-            largest_contour = max(contours, key=cv2.contourArea)
-            x, y, w, h = cv2.boundingRect(largest_contour)
-            x = max(x - margin, 0)
-            y = max(y - margin, 0)
-            x2 = min(x + w + 2 * margin, image_color.shape[1])
-            y2 = min(y + h + 2 * margin, image_color.shape[0])
-            cv2.rectangle(image_color, (x, y), (x2, y2), (0, 255, 0), 2)
-        if len(image_color.shape) == 2:
-            image_rgb = cv2.cvtColor(image_color, cv2.COLOR_GRAY2RGB)
-        else:
-            image_rgb = cv2.cvtColor(image_color, cv2.COLOR_BGR2RGB)
-        im_pil = Image.fromarray(image_rgb)
-        self.current_preview_pil = im_pil
-        self.update_canvas_image()
+        self.detection_worker.submit(self.sample_path, self.sample_gray, self.preview_threshold(),
+                                     self.margin_scale.get(), self.settings["detection_scale"],
+                                     self.settings["strip_mb"])
+        if self.detection_poll_job is None:
+            self.detection_poll_job = self.after(15, self.poll_detection)
+
+    def poll_detection(self):
+        self.detection_poll_job = None
+        # Check idle before taking the result so a result finished in between is not missed.
+        idle = self.detection_worker.idle()
+        result = self.detection_worker.take_result()
+        if result is not None and result[0] == self.sample_path:
+            self.crop_box = result[1]
+            self.draw_crop_overlay()
+        if not idle:
+            self.detection_poll_job = self.after(15, self.poll_detection)
+
+    def draw_crop_overlay(self):
+        self.preview_canvas.delete("crop_box")
+        if self.crop_box is None or self.current_preview_pil is None:
+            return
+        left, top = self.image_origin()
+        x, y, x2, y2 = self.crop_box
+        zoom = self.zoom_factor
+        self.preview_canvas.create_rectangle(left + x * zoom, top + y * zoom, left + x2 * zoom, top + y2 * zoom,
+                                             outline="#00ff00", width=2, tags="crop_box")
+
+    def build_pyramid(self):
+        self.pyramid = [self.current_preview_pil]
+        level = self.current_preview_pil
+        while max(level.size) > max(self.canvas_width, self.canvas_height) and min(level.size) > 1:
+            level = level.reduce(2)
+            self.pyramid.append(level)
+
+    def image_origin(self):
+        # Canvas position of the image's top-left corner at the current zoom and pan.
+        w, h = self.current_preview_pil.size
+        left = self.canvas_width / 2 + self.pan_x - w * self.zoom_factor / 2
+        top = self.canvas_height / 2 + self.pan_y - h * self.zoom_factor / 2
+        return left, top
 
-    def update_canvas_image(self):
+    def update_canvas_image(self, fast=False):
+        # Only the visible part of the image (plus half a canvas of padding, so short drags are
+        # covered) is resampled, from the smallest pyramid level that still has enough detail.
         if self.current_preview_pil is None:
             return
+        self.preview_canvas.delete("preview")
+        self.preview_photo = None
+        self.rendered_bounds = None
+        self.rendered_pan = (self.pan_x, self.pan_y)
+        self.draw_crop_overlay()
         w, h = self.current_preview_pil.size
-        new_size = (int(w * self.zoom_factor), int(h * self.zoom_factor))
-        try:
-            resample_method = Image.Resampling.LANCZOS
-        except AttributeError:
-            resample_method = Image.LANCZOS
-        resized = self.current_preview_pil.resize(new_size, resample_method)
-        self.preview_photo = ImageTk.PhotoImage(resized)
-        self.preview_canvas.delete("all")
-        center_x = self.canvas_width / 2 + self.pan_x
-        center_y = self.canvas_height / 2 + self.pan_y
-        self.preview_canvas.create_image(center_x, center_y, anchor="center", image=self.preview_photo)
-        if self.select_mode and self.sel_rect_id is not None:
-            self.preview_canvas.lift(self.sel_rect_id)
+        zoom = self.zoom_factor
+        left, top = self.image_origin()
+        pad_x, pad_y = self.canvas_width / 2, self.canvas_height / 2
+        x0 = max(0, int((-pad_x - left) / zoom))
+        y0 = max(0, int((-pad_y - top) / zoom))
+        x1 = min(w, int(math.ceil((self.canvas_width + pad_x - left) / zoom)))
+        y1 = min(h, int(math.ceil((self.canvas_height + pad_y - top) / zoom)))
+        if x1 <= x0 or y1 <= y0:
+            return
+        level_index = 0
+        while level_index + 1 < len(self.pyramid) and zoom * 2 ** (level_index + 1) <= 1:
+            level_index += 1
+        level = self.pyramid[level_index]
+        step = 2 ** level_index
+        lx0, ly0 = x0 // step, y0 // step
+        lx1 = min(level.width, -(-x1 // step))
+        ly1 = min(level.height, -(-y1 // step))
+        out_w = max(1, int(round((lx1 - lx0) * step * zoom)))
+        out_h = max(1, int(round((ly1 - ly0) * step * zoom)))
+        region = level.crop((lx0, ly0, lx1, ly1)).resize((out_w, out_h), BILINEAR if fast else LANCZOS)
+        self.preview_photo = ImageTk.PhotoImage(region)
+        dest_x = left + lx0 * step * zoom
+        dest_y = top + ly0 * step * zoom
+        self.preview_canvas.create_image(dest_x, dest_y, anchor="nw", image=self.preview_photo, tags="preview")
+        self.preview_canvas.tag_lower("preview")
+        self.rendered_bounds = (dest_x, dest_y, dest_x + out_w, dest_y + out_h)
+
+    def rendered_covers_view(self):
+        # True if the already-rendered bitmap, shifted by the pan since it was drawn,
+        # still covers every part of the image that is visible on the canvas.
+        if self.rendered_bounds is None:
+            return False
+        w, h = self.current_preview_pil.size
+        left, top = self.image_origin()
+        vx0, vy0 = max(0, left), max(0, top)
+        vx1 = min(self.canvas_width, left + w * self.zoom_factor)
+        vy1 = min(self.canvas_height, top + h * self.zoom_factor)
+        if vx1 <= vx0 or vy1 <= vy0:
+            return True
+        dx = self.pan_x - self.rendered_pan[0]
+        dy = self.pan_y - self.rendered_pan[1]
+        bx0, by0, bx1, by1 = self.rendered_bounds
+        return (bx0 + dx <= vx0 + 1 and by0 + dy <= vy0 + 1 and
+                bx1 + dx >= vx1 - 1 and by1 + dy >= vy1 - 1)
+
+    def schedule_settle(self):
+        if self.settle_job is not None:
+            self.after_cancel(self.settle_job)
+        self.settle_job = self.after(200, self.settle_render)
+
+    def settle_render(self):
+        self.settle_job = None
+        self.update_canvas_image()
 
     # --- Unified Left Mouse Handlers ---
     def on_left_button_press(self, event):
@@ -279,7 +428,17 @@ class OpenScanImageCropper(tk.Tk):
         dy = event.y - self.pan_start_y
         self.pan_x = self.pan_start_offset_x + dx
         self.pan_y = self.pan_start_offset_y + dy
-        self.update_canvas_image()
+        if self.current_preview_pil is None:
+            return
+        if self.rendered_covers_view():
+            # Just move the existing bitmap; nothing is resampled or re-encoded.
+            x0, y0 = self.rendered_bounds[:2]
+            self.preview_canvas.coords("preview", x0 + self.pan_x - self.rendered_pan[0],
+                                       y0 + self.pan_y - self.rendered_pan[1])
+            self.draw_crop_overlay()
+        else:
+            self.update_canvas_image(fast=True)
+        self.schedule_settle()
 
     # --- Zoom Handler ---
     def do_zoom(self, event):
@@ -302,7 +461,8 @@ class OpenScanImageCropper(tk.Tk):
         self.zoom_factor = new_zoom
         self.pan_x = event.x - self.canvas_width/2 - rel_x * new_zoom
         self.pan_y = event.y - self.canvas_height/2 - rel_y * new_zoom
-        self.update_canvas_image()
+        self.update_canvas_image(fast=True)
+        self.schedule_settle()
 
     # --- Selection Mode Handlers ---
     def activate_selection_mode(self):
@@ -348,8 +508,14 @@ class OpenScanImageCropper(tk.Tk):
             cropped = self.current_preview_pil.crop((sel_img_x1, sel_img_y1, sel_img_x2, sel_img_y2))
             cropped_gray = cv2.cvtColor(np.array(cropped), cv2.COLOR_RGB2GRAY)
             new_threshold = int(np.mean(cropped_gray))
+            message = f"Threshold set to {new_threshold} from selected region."
+            if self.settings["threshold_mode"] != "manual":
+                # The scale is disabled (and ignored) in the automatic modes.
+                self.threshold_mode_var.set("manual")
+                self.change_threshold_mode("manual")
+                message += " Threshold mode switched to manual."
             self.threshold_scale.set(new_threshold)
-            messagebox.showinfo("Threshold Set", f"Threshold set to {new_threshold} from selected region.")
+            messagebox.showinfo("Threshold Set", message)
         self.preview_canvas.delete(self.sel_rect_id)
         self.sel_rect_id = None
         self.select_mode = False
@@ -360,29 +526,33 @@ class OpenScanImageCropper(tk.Tk):
         if not self.image_list:
             messagebox.showinfo("No Images", "No images in the folder.")
             return
-        extensions = ["*.tif", "*.tiff", "*.jpg", "*.jpeg", "*.png"]
-        all_paths = []
-        for ext in extensions:
-            all_paths.extend(glob.glob(os.path.join(self.input_folder_entry.get(), ext)))
-        all_paths = sorted(all_paths)
-        total = len(all_paths)
-        self.progress_bar["maximum"] = total
-        darkest_index = None
-        darkest_brightness = float("inf")
-        for idx, path in enumerate(all_paths):
-            img = cv2.imread(path)
-            if img is None:
-                continue
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            avg = np.mean(gray)
-            if avg < darkest_brightness:
-                darkest_brightness = avg
-                darkest_index = idx
-            self.progress_bar["value"] = idx + 1
-            self.progress_bar.update_idletasks()
+        if self.batch_thread is not None and self.batch_thread.is_alive():
+            messagebox.showinfo("Processing", "A batch is already running.")
+            return
+        folder = self.input_folder_entry.get()
+        image_paths = self.list_input_images(folder)
+        self.batch_thread = threading.Thread(target=self.darkest_image_thread, args=(folder, image_paths),
+                                             daemon=True)
+        self.batch_thread.start()
+        self.after(50, self.poll_batch_queue)
+
+    def darkest_image_thread(self, folder, image_paths):
+        # Brightness stats come from the folder's sidecar index; only new or changed files are decoded.
+        def on_progress(done, total):
+            self.batch_queue.put(("progress", done, total))
+
+        darkest_path, darkest_brightness = None, None
+        try:
+            darkest_path, darkest_brightness = find_darkest(folder, image_paths,
+                                                            self.settings["brightness_fast"],
+                                                            self.settings["workers"], on_progress)
+        finally:
+            self.batch_queue.put(("darkest", darkest_path, darkest_brightness))
+
+    def show_darkest_image(self, darkest_path, darkest_brightness):
         self.progress_bar["value"] = 0
-        if darkest_index is not None:
-            self.current_index = darkest_index
+        if darkest_path is not None and darkest_path in self.image_list:
+            self.current_index = self.image_list.index(darkest_path)
             self.load_current_image(reset_zoom=True)
             messagebox.showinfo("Darkest Image Loaded", f"Darkest image loaded (avg brightness: {int(darkest_brightness)}).\nNow use 'Select Region for Threshold' if desired.")
         else:
@@ -415,59 +585,96 @@ class OpenScanImageCropper(tk.Tk):
 
     # --- Processing ---
     def process_image(self, image_path, output_folder, brightness_threshold, margin, prefix, output_format):
-        image = cv2.imread(image_path)
-        if image is None:
-            print(f"Could not read {image_path}")
+        return process_image(image_path, output_folder, brightness_threshold, margin, prefix, output_format,
+                             **crop_options(self.settings, self.input_folder_entry.get()))
+
+    def process_images_thread(self, input_folder, output_folder, brightness_threshold, margin, prefix, output_format):
+        image_paths = list_images(input_folder, self.settings["recursive"], [output_folder])
+        total = len(image_paths)
+        self.batch_queue.put(("start", total))
+        processor = make_processor(self.settings["batch_engine"], self.settings["workers"],
+                                   self.settings["max_in_flight"], self.settings["io_threads"],
+                                   self.settings["sequence_chunk"], self.settings["uniform_crop"])
+
+        def on_result(index, image_path, output_path, error):
+            self.batch_queue.put(("result", image_path, output_path, error))
+
+        def on_status(depths):
+            self.batch_queue.put(("status", depths))
+
+        run_stats = RunStats() if self.settings["write_stats"] else None
+        try:
+            processor.run(image_paths, output_folder, brightness_threshold, margin, prefix, output_format,
+                          on_result=on_result, incremental=self.settings["incremental"], on_status=on_status,
+                          run_stats=run_stats, **crop_options(self.settings, input_folder))
+            if run_stats is not None:
+                run_stats.write(output_folder)
+        finally:
+            self.batch_queue.put(("done", total, processor.skipped))
+
+    def poll_batch_queue(self):
+        finished = False
+        try:
+            while True:
+                message = self.batch_queue.get_nowait()
+                if message[0] == "start":
+                    self.progress_bar["maximum"] = max(message[1], 1)
+                    self.progress_bar["value"] = 0
+                    self.result_times.clear()
+                elif message[0] == "result":
+                    self.progress_bar["value"] += 1
+                    self.result_times.append(time.monotonic())
+                    self.update_rate_label()
+                elif message[0] == "done":
+                    finished = True
+                    self.progress_bar["value"] = 0
+                    self.status_label.config(text="")
+                    self.rate_label.config(text="")
+                    summary = f"Processed {message[1]} images."
+                    if message[2]:
+                        summary += f"\n{message[2]} were already up to date and skipped."
+                    messagebox.showinfo("Processing Complete", summary)
+                elif message[0] == "status":
+                    self.status_label.config(
+                        text="Queued: " + ", ".join(f"{stage} {depth}" for stage, depth in message[1].items()))
+                elif message[0] == "progress":
+                    self.progress_bar["maximum"] = max(message[2], 1)
+                    self.progress_bar["value"] = message[1]
+                elif message[0] == "watch":
+                    self.status_label.config(text=f"Watching: {message[1]} cropped, last {os.path.basename(message[2])}")
+                elif message[0] == "watch_stopped":
+                    finished = True
+                    self.watch_stop = None
+                    self.watch_button.config(text="Watch Input Folder", state="normal")
+                    self.status_label.config(text=f"Stopped watching after {message[1]} images.")
+                elif message[0] == "job":
+                    job = message[1]
+                    self.status_label.config(text=f"Job #{job['id']}: {job['done']}/{job['total']} {job['status']}")
+                    self.refresh_job_list()
+                elif message[0] == "jobs_done":
+                    finished = True
+                    self.job_stop = None
+                    self.status_label.config(text="")
+                    self.refresh_job_list()
+                elif message[0] == "darkest":
+                    finished = True
+                    self.show_darkest_image(message[1], message[2])
+        except queue.Empty:
+            pass
+        if not finished:
+            self.after(50, self.poll_batch_queue)
+
+    def update_rate_label(self):
+        # Rate over the most recent results, so files skipped as up to date don't skew the ETA for long.
+        if len(self.result_times) < 2:
             return
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        _, thresh = cv2.threshold(gray, brightness_threshold, 255, cv2.THRESH_BINARY)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if not contours:
-            print(f"No bright object found in {image_path}. Skipping.")
+        span = self.result_times[-1] - self.result_times[0]
+        if span <= 0:
             return
-        largest_contour = max(contours, key=cv2.contourArea)
-        x, y, w, h = cv2.boundingRect(largest_contour)
-        x = max(x - margin, 0)
-        y = max(y - margin, 0)
-        x2 = min(x + w + 2 * margin, image.shape[1])
-        y2 = min(y + h + 2 * margin, image.shape[0])
-        cropped = image[y:y2, x:x2]
-        base_name = os.path.basename(image_path)
-        name, ext = os.path.splitext(base_name)
-        if prefix:
-            name = f"{prefix}_{name}"
-        if output_format == "Original":
-            ext = ext
-        elif output_format == "TIFF":
-            ext = ".tif"
-        elif output_format == "PNG":
-            ext = ".png"
-        elif output_format == "JPG":
-            ext = ".jpg"
-        new_filename = name + ext
-        output_path = os.path.join(output_folder, new_filename)
-        cv2.imwrite(output_path, cropped)
-        print(f"Saved cropped image to {output_path}")
-
-    def process_images_thread(self):
-        input_folder = self.input_folder_entry.get()
-        output_folder = self.output_folder_entry.get()
-        brightness_threshold = self.threshold_scale.get()
-        margin = self.margin_scale.get()
-        prefix = self.prefix_entry.get().strip()
-        output_format = self.output_format_var.get()
-        extensions = ["*.tif", "*.tiff", "*.jpg", "*.jpeg", "*.png"]
-        image_paths = []
-        for ext in extensions:
-            image_paths.extend(glob.glob(os.path.join(input_folder, ext)))
-        total = len(image_paths)
-        self.progress_bar["maximum"] = total
-        for i, image_path in enumerate(image_paths):
-            self.process_image(image_path, output_folder, brightness_threshold, margin, prefix, output_format)
-            self.progress_bar["value"] = i + 1
-            self.progress_bar.update_idletasks()
-        messagebox.showinfo("Processing Complete", f"Processed {total} images.")
-        self.progress_bar["value"] = 0
+        rate = (len(self.result_times) - 1) / span
+        remaining = self.progress_bar["maximum"] - self.progress_bar["value"]
+        eta = int(remaining / rate)
+        self.rate_label.config(text=f"{rate:.1f} img/s, ETA {eta // 60}:{eta % 60:02d}")
 
     def start_process_all(self):
         if not self.input_folder_entry.get() or not self.output_folder_entry.get():
@@ -476,8 +683,47 @@ class OpenScanImageCropper(tk.Tk):
         if not self.image_list:
             messagebox.showinfo("No Images", "No images to process.")
             return
-        thread = threading.Thread(target=self.process_images_thread)
-        thread.start()
+        if self.batch_thread is not None and self.batch_thread.is_alive():
+            messagebox.showinfo("Processing", "A batch is already running.")
+            return
+        # Read the widgets here on the main thread; the worker thread never touches Tk.
+        args = (self.input_folder_entry.get(), self.output_folder_entry.get(), self.threshold_scale.get(),
+                self.margin_scale.get(), self.prefix_entry.get().strip(), self.output_format_var.get())
+        self.batch_thread = threading.Thread(target=self.process_images_thread, args=args, daemon=True)
+        self.batch_thread.start()
+        self.after(50, self.poll_batch_queue)
+
+    def toggle_watch(self):
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+            self.watch_button.config(text="Stopping...", state="disabled")
+            return
+        if not self.input_folder_entry.get() or not self.output_folder_entry.get():
+            messagebox.showerror("Missing Folder", "Please select both input and output folders.")
+            return
+        if self.batch_thread is not None and self.batch_thread.is_alive():
+            messagebox.showinfo("Processing", "A batch is already running.")
+            return
+        watcher = FolderWatcher(self.input_folder_entry.get(), self.output_folder_entry.get(),
+                                self.threshold_scale.get(), self.margin_scale.get(), self.prefix_entry.get().strip(),
+                                self.output_format_var.get(), self.settings["workers"], self.settings["max_in_flight"],
+                                settle_time=self.settings["watch_settle_time"],
+                                **crop_options(self.settings, self.input_folder_entry.get()))
+        self.watch_stop = threading.Event()
+        self.batch_thread = threading.Thread(target=self.watch_thread, args=(watcher, self.watch_stop), daemon=True)
+        self.batch_thread.start()
+        self.watch_button.config(text="Stop Watching")
+        self.status_label.config(text="Watching: waiting for new images...")
+        self.after(50, self.poll_batch_queue)
+
+    def watch_thread(self, watcher, stop_event):
+        def on_result(image_path, output_path, error):
+            self.batch_queue.put(("watch", watcher.processed, image_path))
+
+        try:
+            watcher.run(stop_event, on_result)
+        finally:
+            self.batch_queue.put(("watch_stopped", watcher.processed))
 
     def process_current_image(self):
         input_folder = self.input_folder_entry.get()
@@ -496,6 +742,93 @@ class OpenScanImageCropper(tk.Tk):
         self.process_image(current_path, output_folder, brightness_threshold, margin, prefix, output_format)
         messagebox.showinfo("Processing Complete", f"Processed current image: {os.path.basename(current_path)}")
 
+    # --- Job Queue ---
+    def add_job(self):
+        # Queues the current folders and settings as one job; the queue file keeps it across restarts.
+        input_folder = self.input_folder_entry.get()
+        output_folder = self.output_folder_entry.get()
+        if not input_folder or not output_folder:
+            messagebox.showerror("Missing Folder", "Please select both input and output folders.")
+            return
+        job_id = self.job_queue.add(input_folder, output_folder, self.threshold_scale.get(), self.margin_scale.get(),
+                                    self.prefix_entry.get().strip(), self.output_format_var.get(),
+                                    **crop_options(self.settings, input_folder))
+        self.status_label.config(text=f"Queued job #{job_id}: {input_folder}")
+        self.refresh_job_list()
+
+    def open_job_window(self):
+        if self.job_window is not None:
+            self.job_window.lift()
+            return
+        self.job_window = tk.Toplevel(self)
+        self.job_window.title("Job Queue")
+        self.job_listbox = tk.Listbox(self.job_window, width=110, height=12, font=("Courier", 9))
+        self.job_listbox.pack(padx=10, pady=10)
+        button_frame = tk.Frame(self.job_window)
+        button_frame.pack(pady=(0, 10))
+        self.job_run_button = tk.Button(button_frame, text="Run Queue", command=self.toggle_job_runner)
+        self.job_run_button.grid(row=0, column=0, padx=5)
+        tk.Button(button_frame, text="Cancel Selected", command=self.cancel_selected_job).grid(row=0, column=1, padx=5)
+        tk.Button(button_frame, text="Clear Finished", command=self.clear_finished_jobs).grid(row=0, column=2, padx=5)
+        self.job_window.protocol("WM_DELETE_WINDOW", self.close_job_window)
+        self.job_queue.refresh()  # Shows jobs added or changed by "job_queue.py" meanwhile.
+        self.refresh_job_list()
+
+    def close_job_window(self):
+        self.job_window.destroy()
+        self.job_window = None
+        self.job_listbox = None
+
+    def refresh_job_list(self):
+        if self.job_listbox is None:
+            return
+        self.job_jobs = self.job_queue.snapshot()
+        selection = self.job_listbox.curselection()
+        self.job_listbox.delete(0, tk.END)
+        for job in self.job_jobs:
+            self.job_listbox.insert(tk.END, describe(job))
+        for index in selection:
+            self.job_listbox.selection_set(index)
+        self.job_run_button.config(text="Stop Queue" if self.job_stop is not None else "Run Queue",
+                                   state="disabled" if self.job_stop is not None and self.job_stop.is_set()
+                                   else "normal")
+
+    def cancel_selected_job(self):
+        for index in self.job_listbox.curselection():
+            job = self.job_jobs[index]
+            if job["status"] not in FINISHED:
+                self.job_queue.cancel(job["id"])
+        self.refresh_job_list()
+
+    def clear_finished_jobs(self):
+        self.job_queue.clear_finished()
+        self.refresh_job_list()
+
+    def toggle_job_runner(self):
+        if self.job_stop is not None:
+            # Files being cropped finish; unfinished jobs stay queued for the next run.
+            self.job_stop.set()
+            self.refresh_job_list()
+            return
+        if self.batch_thread is not None and self.batch_thread.is_alive():
+            messagebox.showinfo("Processing", "A batch is already running.")
+            return
+        self.job_stop = threading.Event()
+        runner = JobRunner(self.job_queue, self.settings["workers"], self.settings["max_in_flight"])
+        self.batch_thread = threading.Thread(target=self.job_queue_thread, args=(runner, self.job_stop), daemon=True)
+        self.batch_thread.start()
+        self.refresh_job_list()
+        self.after(50, self.poll_batch_queue)
+
+    def job_queue_thread(self, runner, stop_event):
+        def on_progress(job):
+            self.batch_queue.put(("job", job))
+
+        try:
+            runner.run(stop_event, on_progress)
+        finally:
+            self.batch_queue.put(("jobs_done",))
+
     # --- On Close ---
     def on_close(self):
         self.settings["input_folder"] = self.input_folder_entry.get()
@@ -505,8 +838,16 @@ class OpenScanImageCropper(tk.Tk):
         self.settings["custom_prefix"] = self.prefix_entry.get().strip()
         self.settings["output_format"] = self.output_format_var.get()
         save_settings(self.settings)
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+        if self.job_stop is not None:
+            self.job_stop.set()
+        self.prefetcher.stop()
+        self.detection_worker.stop()
         self.destroy()
 
 if __name__ == "__main__":
+    # Needed for the process pool in frozen (PyInstaller) Windows builds.
+    multiprocessing.freeze_support()
     app = OpenScanImageCropper()
     app.mainloop()
@@ -0,0 +1,121 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+from crop_batch import init_worker, pool_limits
+
+# Sidecar file stored in the scanned folder; entries are reused while a file's size and mtime are unchanged.
+INDEX_FILE = ".openscan_brightness.json"
+PERCENTILES = [1, 5, 50, 95, 99]
+
+
+def image_stats(path, fast=True):
+    # Brightness statistics of one image. Fast mode asks the decoder for a 1/4 grayscale image
+    # (JPEGs are then decoded at reduced scale), which is close enough for ranking by brightness.
+    flags = cv2.IMREAD_REDUCED_GRAYSCALE_4 if fast else cv2.IMREAD_GRAYSCALE
+    gray = cv2.imread(path, flags)
+    if gray is None:
+        return None
+    histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    total = histogram.sum()
+    cumulative = np.cumsum(histogram)
+    percentiles = {str(p): int(np.searchsorted(cumulative, total * p / 100.0)) for p in PERCENTILES}
+    return {
+        "mean": float(np.dot(histogram, np.arange(256)) / total),
+        "histogram": histogram.astype(int).tolist(),
+        "percentiles": percentiles,
+        "fast": fast,
+    }
+
+
+class BrightnessIndex:
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, INDEX_FILE)
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(e)
+                self.entries = {}
+
+    def save(self):
+        # Written via a temp file so an interrupted save never leaves a truncated index.
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save brightness index: {e}")
+
+    def key_for(self, path):
+        # Relative to the indexed folder, so the index survives moving the whole folder.
+        return os.path.relpath(path, self.folder).replace(os.sep, "/")
+
+    def lookup(self, path, fast=True):
+        # Cached stats if the file is unchanged (and exact stats when exact were requested), else None.
+        entry = self.entries.get(self.key_for(path))
+        if entry is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if entry["size"] != st.st_size or entry["mtime"] != st.st_mtime_ns:
+            return None
+        if entry["stats"]["fast"] and not fast:
+            return None
+        return entry["stats"]
+
+    def scan(self, paths, fast=True, workers=0, on_progress=None):
+        # Returns {path: stats} for every readable image, decoding only new or changed files
+        # in a process pool. on_progress(done, total) is called from this thread.
+        results = {}
+        stale = []
+        for path in paths:
+            stats = self.lookup(path, fast)
+            if stats is None:
+                stale.append(path)
+            else:
+                results[path] = stats
+        total = len(paths)
+        done = total - len(stale)
+        if on_progress is not None:
+            on_progress(done, total)
+        if stale:
+            workers, _ = pool_limits(workers)
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+                futures = {executor.submit(image_stats, path, fast): path for path in stale}
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        stats = future.result()
+                    except Exception as e:
+                        print(f"Failed to analyse {path}: {e}")
+                        stats = None
+                    if stats is not None:
+                        st = os.stat(path)
+                        self.entries[self.key_for(path)] = {
+                            "size": st.st_size, "mtime": st.st_mtime_ns, "stats": stats}
+                        results[path] = stats
+                    done += 1
+                    if on_progress is not None:
+                        on_progress(done, total)
+            self.save()
+        return results
+
+
+def find_darkest(folder, paths, fast=True, workers=0, on_progress=None):
+    # (path, mean brightness) of the darkest image among paths in folder, or (None, None).
+    if not paths:
+        return None, None
+    index = BrightnessIndex(folder)
+    results = index.scan(paths, fast, workers, on_progress)
+    if not results:
+        return None, None
+    darkest = min(results, key=lambda path: results[path]["mean"])
+    return darkest, results[darkest]["mean"]
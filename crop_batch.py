@@ -0,0 +1,230 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import cv2
+from crop_core import process_image
+
+# Written to the output folder; one JSON line per finished source image.
+MANIFEST_FILE = ".openscan_manifest.jsonl"
+
+
+def default_worker_count():
+    return max(1, os.cpu_count() or 1)
+
+
+def pool_limits(workers=0, max_in_flight=0):
+    # (workers, max_in_flight) with 0 meaning one worker per core and two files per worker.
+    # Bounding the submitted-but-unfinished files keeps huge folders from queueing everything at once.
+    workers = workers if workers and workers > 0 else default_worker_count()
+    return workers, max_in_flight if max_in_flight and max_in_flight > 0 else workers * 2
+
+
+def init_worker():
+    # Each worker already owns a core; stop OpenCV from spawning its own thread pool on top.
+    cv2.setNumThreads(1)
+
+
+class Manifest:
+    # Records, per source image, its size/mtime, the crop parameters and the output path.
+    # Lines are appended and flushed as each file finishes, so an interrupted run can resume
+    # and a re-run only processes new, changed or re-parameterised images.
+    def __init__(self, output_folder):
+        self.path = os.path.join(output_folder, MANIFEST_FILE)
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short by a crash.
+                    self.entries[entry["source"]] = entry
+            self.compact()
+        self.file = None
+
+    def compact(self):
+        # Keep only the newest entry per source so re-runs don't grow the file forever.
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def params(brightness_threshold, margin, prefix, output_format, **options):
+        params = {"threshold": brightness_threshold, "margin": margin, "prefix": prefix,
+                  "output_format": output_format}
+        params.update(options)
+        return params
+
+    def is_up_to_date(self, image_path, params):
+        entry = self.entries.get(os.path.abspath(image_path))
+        if entry is None or entry["params"] != params:
+            return False
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return False
+        if entry["size"] != st.st_size or entry["mtime"] != st.st_mtime_ns:
+            return False
+        # Images without a bright object are recorded with no output and stay skipped.
+        return entry["output"] is None or os.path.exists(entry["output"])
+
+    def output_for(self, image_path):
+        return self.entries[os.path.abspath(image_path)]["output"]
+
+    def record(self, image_path, params, output_path, threshold=None):
+        # threshold is the one actually used, which differs per file in the automatic modes.
+        st = os.stat(image_path)
+        entry = {"source": os.path.abspath(image_path), "size": st.st_size, "mtime": st.st_mtime_ns,
+                 "params": params, "output": os.path.abspath(output_path) if output_path else None}
+        if threshold is not None:
+            entry["threshold"] = threshold
+        self.entries[entry["source"]] = entry
+        if self.file is None:
+            self.file = open(self.path, "a")
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def process_with_stats(image_path, *args, collect_stats=False, **options):
+    # Worker entry point: (output_path, stats dict or None).
+    stats = {} if collect_stats else None
+    return process_image(image_path, *args, stats=stats, **options), stats
+
+
+def records_threshold(options):
+    # Automatic thresholds differ per file, so the stats dict that carries them back is always collected.
+    return options.get("threshold_mode", "manual") != "manual"
+
+
+def result_reporter(manifest, params, run_stats, on_result):
+    # finish(index, image_path, output_path, error, stats) for one finished image: records it in
+    # the manifest and run stats (when given) and reports it through on_result.
+    def finish(index, image_path, output_path, error, stats):
+        if manifest is not None and error is None:
+            manifest.record(image_path, params, output_path, (stats or {}).get("brightness_threshold"))
+        if run_stats is not None:
+            run_stats.add(image_path, output_path, error, stats)
+        if on_result is not None:
+            on_result(index, image_path, output_path, error)
+    return finish
+
+
+def submit_bounded(items, submit, on_done, max_in_flight, cancel_event=None, on_status=None, status_interval=0.5):
+    # Calls submit(item) -> future for each item while keeping at most max_in_flight pending,
+    # and on_done(item, future) from this thread as each finishes. Stops submitting once
+    # cancel_event is set; on_status({"in_flight": n}) is called every status_interval seconds
+    # without a result. Returns the sum of what on_done returned.
+    finished = 0
+    pending = {}
+    remaining = iter(items)
+    exhausted = False
+    while pending or not exhausted:
+        while not exhausted and len(pending) < max_in_flight:
+            if cancel_event is not None and cancel_event.is_set():
+                exhausted = True
+                break
+            try:
+                item = next(remaining)
+            except StopIteration:
+                exhausted = True
+                break
+            pending[submit(item)] = item
+        if not pending:
+            break
+        done, _ = wait(pending, timeout=status_interval, return_when=FIRST_COMPLETED)
+        if not done and on_status is not None:
+            on_status({"in_flight": len(pending)})
+        for future in done:
+            finished += on_done(pending.pop(future), future)
+    return finished
+
+
+def skip_up_to_date(manifest, image_paths, params, on_result=None):
+    # Reports files the manifest marks as up to date through on_result and returns
+    # ([(index, path) still to process], number skipped).
+    work = []
+    skipped = 0
+    for index, image_path in enumerate(image_paths):
+        if manifest is not None and manifest.is_up_to_date(image_path, params):
+            skipped += 1
+            if on_result is not None:
+                on_result(index, image_path, manifest.output_for(image_path), None)
+        else:
+            work.append((index, image_path))
+    return work, skipped
+
+
+class BatchProcessor:
+    # Fans process_image out to a process pool. Results are reported through
+    # on_result(index, image_path, output_path, error) from the calling thread,
+    # so a GUI can forward them into a queue instead of touching widgets here.
+    def __init__(self, workers=0, max_in_flight=0):
+        self.workers, self.max_in_flight = pool_limits(workers, max_in_flight)
+        self.skipped = 0
+
+    def run(self, image_paths, output_folder, brightness_threshold, margin, prefix, output_format,
+            on_result=None, cancel_event=None, incremental=False, on_status=None, status_interval=0.5,
+            run_stats=None, **options):
+        # Extra keyword options (e.g. detection_scale) are passed through to process_image.
+        # on_status({"in_flight": n}) is called from this thread every status_interval seconds.
+        # If run_stats (a run_stats.RunStats) is given, per-stage timings of each processed image are added to it.
+        # With incremental=True, files the output folder's manifest marks as up to date are
+        # reported without being processed and every finished file is recorded.
+        manifest = Manifest(output_folder) if incremental else None
+        params = Manifest.params(brightness_threshold, margin, prefix, output_format, **options)
+        work, self.skipped = skip_up_to_date(manifest, image_paths, params, on_result)
+        processed = self.skipped
+        finish = result_reporter(manifest, params, run_stats, on_result)
+        args = (output_folder, brightness_threshold, margin, prefix, output_format)
+        options["collect_stats"] = run_stats is not None or records_threshold(options)
+        try:
+            if self.workers == 1:
+                processed += self._run_inline(work, args, options, finish, cancel_event)
+            else:
+                processed += self._run_pool(work, args, options, finish, cancel_event, on_status, status_interval)
+        finally:
+            if manifest is not None:
+                manifest.close()
+        return processed
+
+    def _run_inline(self, work, args, options, finish, cancel_event):
+        processed = 0
+        for index, image_path in work:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            output_path = None
+            error = None
+            stats = None
+            try:
+                output_path, stats = process_with_stats(image_path, *args, **options)
+            except Exception as e:
+                error = str(e)
+                print(f"Failed to process {image_path}: {e}")
+            processed += 1
+            finish(index, image_path, output_path, error, stats)
+        return processed
+
+    def _run_pool(self, work, args, options, finish, cancel_event, on_status, status_interval):
+        def on_done(item, future):
+            index, image_path = item
+            output_path = None
+            error = None
+            stats = None
+            try:
+                output_path, stats = future.result()
+            except Exception as e:
+                error = str(e)
+                print(f"Failed to process {image_path}: {e}")
+            finish(index, image_path, output_path, error, stats)
+            return 1
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker) as executor:
+            return submit_bounded(work, lambda item: executor.submit(process_with_stats, item[1], *args, **options),
+                                  on_done, self.max_in_flight, cancel_event, on_status, status_interval)
@@ -0,0 +1,149 @@
+# Benchmarks the crop pipeline on generated OpenScan-like frames and writes a JSON report,
+# so runs before and after a change can be compared:
+#   python crop_benchmark.py --output before.json
+#   python crop_benchmark.py --sizes 6000x4000 --formats tif --depths 16 --workers 1,4,8
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import cv2
+import numpy as np
+from crop_core import DEFAULT_SETTINGS, apply_margin, binarize, crop_options, native_threshold, to_gray
+from crop_pipeline import make_processor
+from simulate_scanner import synthetic_frame
+
+
+def generate_dataset(folder, width, height, bit_depth, image_format, count):
+    # Writes count frames and returns their paths. 16-bit frames are the 8-bit ones scaled
+    # to the full 16-bit range, which keeps the object/background contrast identical.
+    paths = []
+    for index in range(count):
+        image = synthetic_frame(index, width, height)
+        if bit_depth == 16:
+            image = image.astype(np.uint16) * 257
+        path = os.path.join(folder, f"frame_{index:04d}.{image_format}")
+        cv2.imwrite(path, image)
+        paths.append(path)
+    return paths
+
+
+def time_stages(path, brightness_threshold, margin, repeats):
+    # Median wall time in milliseconds of each step process_image performs on one file.
+    # The image keeps its bit depth, as with the default preserve_depth setting.
+    timings = {stage: [] for stage in ["decode", "cvtColor", "threshold", "findContours", "crop", "encode"]}
+    suffix = os.path.splitext(path)[1]
+    out_path = os.path.join(os.path.dirname(path), "bench_out" + suffix)
+    for _ in range(repeats):
+        start = time.perf_counter()
+        image = cv2.imread(path, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_ANYCOLOR)
+        timings["decode"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        gray = to_gray(image)
+        timings["cvtColor"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        thresh = binarize(gray, native_threshold(brightness_threshold, gray.dtype))
+        timings["threshold"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        timings["findContours"].append(time.perf_counter() - start)
+
+        x, y, x2, y2 = apply_margin(cv2.boundingRect(max(contours, key=cv2.contourArea)), margin, gray.shape)
+        start = time.perf_counter()
+        cropped = image[y:y2, x:x2]
+        timings["crop"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        cv2.imwrite(out_path, cropped)
+        timings["encode"].append(time.perf_counter() - start)
+    os.remove(out_path)
+    return {stage: round(statistics.median(values) * 1000, 3) for stage, values in timings.items()}
+
+
+def time_batch(paths, output_folder, engine, workers, brightness_threshold, margin):
+    # End-to-end throughput of one batch run in images per second, with the default crop options.
+    processor = make_processor(engine, workers)
+    start = time.perf_counter()
+    processor.run(paths, output_folder, brightness_threshold, margin, "", "Original", **crop_options(DEFAULT_SETTINGS))
+    elapsed = time.perf_counter() - start
+    return {"engine": engine, "workers": workers, "seconds": round(elapsed, 3),
+            "images_per_second": round(len(paths) / elapsed, 3)}
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the crop pipeline on synthetic frames.")
+    parser.add_argument("--sizes", default="1920x1280,4000x3000,6000x4000",
+                        help="comma-separated WIDTHxHEIGHT list (default: %(default)s)")
+    parser.add_argument("--depths", default="8,16", help="bit depths (default: %(default)s)")
+    parser.add_argument("--formats", default="jpg,png,tif", help="file formats (default: %(default)s)")
+    parser.add_argument("--count", type=int, default=16, help="frames per dataset for batch runs")
+    parser.add_argument("--repeats", type=int, default=3, help="repeats per stage timing")
+    parser.add_argument("--workers", default=",".join(str(n) for n in sorted({1, 2, 4, os.cpu_count() or 1})),
+                        help="worker counts for batch runs (default: %(default)s)")
+    parser.add_argument("--engines", default="pool,pipeline", help="batch engines (default: %(default)s)")
+    parser.add_argument("--threshold", type=int, default=200)
+    parser.add_argument("--margin", type=int, default=30)
+    parser.add_argument("--output", default="benchmark.json", help="JSON report path (default: %(default)s)")
+    parser.add_argument("--keep", help="generate the datasets in this folder and keep them")
+    args = parser.parse_args(argv)
+
+    root = args.keep or tempfile.mkdtemp(prefix="openscan_bench_")
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "cpu_count": os.cpu_count(),
+        "threshold": args.threshold,
+        "margin": args.margin,
+        "options": crop_options(DEFAULT_SETTINGS),
+        "results": [],
+    }
+    try:
+        for size in args.sizes.split(","):
+            width, height = parse_size(size)
+            for bit_depth in (int(d) for d in args.depths.split(",")):
+                for image_format in args.formats.split(","):
+                    if bit_depth == 16 and image_format == "jpg":
+                        continue  # JPEG has no 16-bit mode.
+                    name = f"{width}x{height}_{bit_depth}bit_{image_format}"
+                    folder = os.path.join(root, name)
+                    output_folder = os.path.join(folder, "out")
+                    os.makedirs(output_folder, exist_ok=True)
+                    print(f"Generating {name}...")
+                    paths = generate_dataset(folder, width, height, bit_depth, image_format, args.count)
+                    result = {
+                        "dataset": name, "width": width, "height": height, "bit_depth": bit_depth,
+                        "format": image_format, "file_mb": round(os.path.getsize(paths[0]) / 1e6, 3),
+                        "stages_ms": time_stages(paths[0], args.threshold, args.margin, args.repeats),
+                        "batch": [],
+                    }
+                    print(f"  stages (ms): {result['stages_ms']}")
+                    for engine in args.engines.split(","):
+                        for workers in (int(n) for n in args.workers.split(",")):
+                            run = time_batch(paths, output_folder, engine, workers, args.threshold, args.margin)
+                            print(f"  {engine} x{workers}: {run['images_per_second']} images/s")
+                            result["batch"].append(run)
+                    report["results"].append(result)
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# Headless entry point: crops a folder without a display. Only imports the
+# GUI-free crop core, so it is safe for cron jobs, containers and render nodes.
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+from crop_core import (DEFAULT_SETTINGS, OUTPUT_FORMATS, DETECTION_SCALES, BATCH_ENGINES, TIFF_COMPRESSIONS,
+                       THRESHOLD_MODES, SETTINGS_FILE, load_settings, list_images, crop_options)
+from crop_pipeline import make_processor
+from run_stats import RunStats, SUMMARY_FILE
+from watch_folder import FolderWatcher
+
+
+def build_parser(settings):
+    parser = argparse.ArgumentParser(
+        description="Crop OpenScan images to the largest bright object without starting the GUI. "
+                    "Defaults are read from settings.json.")
+    parser.add_argument("input_folder", nargs="?", default=settings["input_folder"],
+                        help="folder containing the source images")
+    parser.add_argument("output_folder", nargs="?", default=settings["output_folder"],
+                        help="folder the cropped images are written to")
+    parser.add_argument("-r", "--recursive", action=argparse.BooleanOptionalAction, default=settings["recursive"],
+                        help="also crop images in subfolders, mirroring them in the output folder "
+                             "(default: %(default)s)")
+    parser.add_argument("-t", "--threshold", type=int, default=settings["threshold"],
+                        help="brightness threshold 0-255 (default: %(default)s)")
+    parser.add_argument("--threshold-mode", choices=THRESHOLD_MODES, default=settings["threshold_mode"],
+                        help="manual = use --threshold; otsu/triangle/percentile = pick a threshold per image "
+                             "(default: %(default)s)")
+    parser.add_argument("--threshold-percentile", type=float, default=settings["threshold_percentile"],
+                        help="background percentile for --threshold-mode percentile (default: %(default)s)")
+    parser.add_argument("-m", "--margin", type=int, default=settings["margin"],
+                        help="margin around the object in pixels (default: %(default)s)")
+    parser.add_argument("-p", "--prefix", default=settings["custom_prefix"],
+                        help="prefix added to output file names")
+    parser.add_argument("-f", "--format", dest="output_format", choices=OUTPUT_FORMATS,
+                        default=settings["output_format"], help="output format (default: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, default=settings["workers"],
+                        help="worker processes, 0 = one per CPU core (default: %(default)s)")
+    parser.add_argument("--detection-scale", type=int, choices=DETECTION_SCALES, default=settings["detection_scale"],
+                        help="find the object on a 1/N proxy and refine at full resolution; "
+                             "1 = exact full-resolution detection (default: %(default)s)")
+    parser.add_argument("--strip-mb", type=int, default=settings["strip_mb"],
+                        help="detect in row strips with at most this many MB of working memory, for very "
+                             "large scans; 0 = whole-frame detection (default: %(default)s)")
+    parser.add_argument("--engine", choices=BATCH_ENGINES, default=settings["batch_engine"],
+                        help="pool = worker processes, pipeline = overlapped read/crop/write threads, "
+                             "sequence = worker processes tracking the object from frame to frame "
+                             "(default: %(default)s)")
+    parser.add_argument("--uniform-crop", action=argparse.BooleanOptionalAction, default=settings["uniform_crop"],
+                        help="sequence engine: cut every frame to the same size, centred on the object "
+                             "(default: %(default)s)")
+    parser.add_argument("--show-queues", action="store_true",
+                        help="periodically print how many images wait in front of each stage")
+    parser.add_argument("--stats", action="store_true", default=settings["write_stats"],
+                        help=f"record per-stage timings and write {SUMMARY_FILE} and a per-file CSV "
+                             "to the output folder")
+    parser.add_argument("--force", action="store_true",
+                        help="reprocess every image, ignoring the output folder's manifest")
+    parser.add_argument("--preserve-depth", action=argparse.BooleanOptionalAction, default=settings["preserve_depth"],
+                        help="keep 16-bit and grayscale images at their native depth (default: %(default)s)")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and crop new images as they are written (Ctrl+C to stop)")
+    parser.add_argument("--lossless-jpeg", action=argparse.BooleanOptionalAction, default=settings["lossless_jpeg"],
+                        help="crop JPEG -> JPEG with jpegtran, without re-encoding (default: %(default)s)")
+    parser.add_argument("--jpeg-quality", type=int, default=settings["jpeg_quality"],
+                        help="JPEG quality when re-encoding (default: %(default)s)")
+    parser.add_argument("--png-compression", type=int, choices=range(10), default=settings["png_compression"],
+                        metavar="0-9", help="PNG compression level (default: %(default)s)")
+    parser.add_argument("--tiff-compression", choices=list(TIFF_COMPRESSIONS), default=settings["tiff_compression"],
+                        help="TIFF compression (default: %(default)s)")
+    parser.add_argument("--settle", type=float, default=settings["watch_settle_time"],
+                        help="watch mode: seconds a file must stay unchanged before it is cropped "
+                             "(default: %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    # Settings path is resolved before the full parse so its values can become the defaults.
+    pre = argparse.ArgumentParser(add_help=False)
+    pre.add_argument("--settings", default=SETTINGS_FILE)
+    pre_args, remaining = pre.parse_known_args(argv)
+    settings = load_settings(pre_args.settings)
+    for key, value in DEFAULT_SETTINGS.items():
+        settings.setdefault(key, value)
+
+    parser = build_parser(settings)
+    parser.add_argument("--settings", default=SETTINGS_FILE,
+                        help="settings file to read defaults from (default: %(default)s)")
+    args = parser.parse_args(remaining)
+    if not args.input_folder or not args.output_folder:
+        parser.error("both input and output folders are required")
+    if not os.path.isdir(args.input_folder):
+        parser.error(f"input folder does not exist: {args.input_folder}")
+    if args.engine == "sequence" and args.strip_mb > 0 and not args.watch:
+        # Tracking needs the whole gray frame, so strip detection cannot bound its memory.
+        parser.error("--strip-mb does not work with --engine sequence; use --strip-mb 0 or another engine")
+    os.makedirs(args.output_folder, exist_ok=True)
+
+    settings["detection_scale"] = args.detection_scale
+    settings["preserve_depth"] = args.preserve_depth
+    settings["strip_mb"] = args.strip_mb
+    settings["recursive"] = args.recursive
+    settings["threshold_mode"] = args.threshold_mode
+    settings["threshold_percentile"] = args.threshold_percentile
+    settings["lossless_jpeg"] = args.lossless_jpeg
+    settings["jpeg_quality"] = args.jpeg_quality
+    settings["png_compression"] = args.png_compression
+    settings["tiff_compression"] = args.tiff_compression
+    if args.watch:
+        return watch(args, settings)
+    image_paths = list_images(args.input_folder, args.recursive, [args.output_folder])
+    if not image_paths:
+        print("No image files found in the input folder.")
+        return 1
+    params = (args.output_folder, args.threshold, args.margin, args.prefix.strip(), args.output_format)
+    processor = make_processor(args.engine, args.jobs, settings["max_in_flight"], settings["io_threads"],
+                               settings["sequence_chunk"], args.uniform_crop)
+    on_status = None
+    if args.show_queues:
+        def on_status(depths):
+            print("Queued: " + ", ".join(f"{stage} {depth}" for stage, depth in depths.items()))
+    run_stats = RunStats() if args.stats else None
+    processor.run(image_paths, *params, incremental=settings["incremental"] and not args.force,
+                  on_status=on_status, status_interval=2.0, run_stats=run_stats,
+                  **crop_options(settings, args.input_folder))
+    if run_stats is not None:
+        run_stats.write(args.output_folder)
+        summary = run_stats.summary()
+        print(f"{summary['images_per_second']} images/s, {summary['mb_read_per_second']} MB/s read")
+    if processor.skipped:
+        print(f"{processor.skipped} images were already up to date and skipped.")
+    print(f"Processed {len(image_paths)} images.")
+    return 0
+
+
+def watch(args, settings):
+    watcher = FolderWatcher(args.input_folder, args.output_folder, args.threshold, args.margin,
+                            args.prefix.strip(), args.output_format, args.jobs, settings["max_in_flight"],
+                            settle_time=args.settle, **crop_options(settings, args.input_folder))
+    stop_event = threading.Event()
+    print(f"Watching {args.input_folder} (Ctrl+C to stop)...")
+    try:
+        watcher.run(stop_event)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    print(f"Processed {watcher.processed} images.")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
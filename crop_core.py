@@ -0,0 +1,509 @@
+import os
+import re
+import json
+import time
+import threading
+import shutil
+import subprocess
+from contextlib import contextmanager
+import cv2
+import numpy as np
+
+# Shared by the GUI and the command line; this module must not import tkinter.
+SETTINGS_FILE = "settings.json"
+IMAGE_EXTENSIONS = (".tif", ".tiff", ".jpg", ".jpeg", ".png")  # Matched case-insensitively.
+OUTPUT_FORMATS = ["Original", "TIFF", "PNG", "JPG"]
+DETECTION_SCALES = [1, 2, 4, 8]
+BATCH_ENGINES = ["pool", "pipeline", "sequence"]
+THRESHOLD_MODES = ["manual", "otsu", "triangle", "percentile"]
+TIFF_COMPRESSIONS = {"none": 1, "lzw": 5, "deflate": 8}
+JPEG_EXTENSIONS = (".jpg", ".jpeg")
+
+DEFAULT_SETTINGS = {
+    "input_folder": "",
+    "output_folder": "",
+    "threshold": 200,
+    "threshold_mode": "manual",  # "manual" uses "threshold"; the others pick a threshold per image.
+    "threshold_percentile": 50.0,  # Background percentile used by the "percentile" mode.
+    "margin": 30,
+    "custom_prefix": "",
+    "output_format": "Original",
+    "workers": 0,  # 0 = one worker per CPU core.
+    "max_in_flight": 0,  # 0 = twice the worker count.
+    "detection_scale": 1,  # 1 = exact full-resolution detection; 2/4/8 = faster, see find_object_rect_proxy.
+    "strip_mb": 0,  # > 0: detect in row strips using at most this many MB on top of the decoded frame.
+    "cache_mb": 1024,  # Memory budget for decoded preview images.
+    "prefetch_radius": 2,  # Neighbouring images decoded ahead while browsing (plus the +-10 jumps).
+    "batch_engine": "pool",  # "pool" = processes, "pipeline" = read/crop/write threads, "sequence" = tracking.
+    "sequence_chunk": 16,  # Consecutive frames each worker tracks through, for the sequence engine.
+    "uniform_crop": False,  # Sequence engine: cut every frame to the same size (largest object plus margin).
+    "io_threads": 2,  # Reader and writer threads each, for the pipeline engine.
+    "preserve_depth": True,  # Crop 16-bit and grayscale images at their native depth and channel count.
+    "write_stats": False,  # Write per-stage timing stats (summary JSON + per-file CSV) to the output folder.
+    "recursive": False,  # Also crop images in subfolders of the input folder.
+    "incremental": True,  # Skip images the output folder's manifest marks as already cropped.
+    "watch_settle_time": 1.0,  # Seconds a watched file must stay unchanged before it is cropped.
+    "brightness_fast": True,  # Darkest-image scan decodes at 1/4 resolution.
+    "lossless_jpeg": True,  # JPEG -> JPEG crops via jpegtran (if installed) instead of re-encoding.
+    "jpeg_quality": 95,
+    "png_compression": 1,  # 0 (fastest, largest) - 9 (slowest, smallest).
+    "tiff_compression": "lzw",  # "none", "lzw" or "deflate".
+}
+
+# Settings passed through the batch engines to process_image as keyword options.
+ENCODE_OPTION_KEYS = ["lossless_jpeg", "jpeg_quality", "png_compression", "tiff_compression"]
+CROP_OPTION_KEYS = ["detection_scale", "preserve_depth", "threshold_mode", "threshold_percentile",
+                    "strip_mb"] + ENCODE_OPTION_KEYS
+
+
+# --- Settings ---
+def load_settings(path=SETTINGS_FILE):
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(e)
+            return {}
+    return {}
+
+
+def save_settings(settings, path=SETTINGS_FILE):
+    with open(path, "w") as f:
+        json.dump(settings, f)
+
+
+def crop_options(settings, input_folder=None):
+    # With recursive scanning, outputs mirror the subfolders below input_folder.
+    options = {key: settings[key] for key in CROP_OPTION_KEYS}
+    if settings["recursive"] and input_folder:
+        options["source_root"] = input_folder
+    return options
+
+
+# --- Folder listing ---
+_listings = {}  # (folder, recursive, exclude) -> (scan time, directory mtimes, image paths)
+# Directory timestamps can be as coarse as 2 s (FAT/exFAT, some SMB/NFS mounts): a file added
+# in the same tick as a scan leaves the mtime unchanged, so a listing is only trusted for
+# directories whose mtime is at least this much older than the scan ("racy git" rule).
+LISTING_MTIME_SLACK_NS = 2 * 10 ** 9
+_listings_lock = threading.Lock()
+
+
+def natural_key(path):
+    # "scan_2" sorts before "scan_10", and case does not matter.
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", path.lower())]
+
+
+def _scan_folder(folder, recursive, exclude):
+    # One os.scandir pass per directory; returns ({directory: mtime_ns}, image paths).
+    mtimes = {}
+    image_paths = []
+    pending = [folder]
+    while pending:
+        directory = pending.pop()
+        try:
+            mtimes[directory] = os.stat(directory).st_mtime_ns
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue  # Hidden files, and the manifest/index sidecars.
+                    if entry.is_file():
+                        if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                            image_paths.append(entry.path)
+                    elif recursive and entry.is_dir() and os.path.abspath(entry.path) not in exclude:
+                        pending.append(entry.path)
+        except OSError as e:
+            print(f"Could not list {directory}: {e}")
+    return mtimes, image_paths
+
+
+def list_images(folder, recursive=False, exclude=()):
+    # Naturally sorted image paths in folder (and its subfolders if recursive, skipping the
+    # exclude folders, e.g. an output folder inside the input folder). The listing is cached
+    # and only rescanned when a scanned directory's mtime changes, which happens whenever a
+    # file in it is added, removed or renamed. Repeated calls on a large network share then
+    # cost one stat per directory. Directories changed shortly before the scan are rescanned.
+    key = (os.path.abspath(folder), recursive, tuple(sorted(os.path.abspath(path) for path in exclude if path)))
+    with _listings_lock:
+        cached = _listings.get(key)
+    if cached is not None:
+        scanned_ns, mtimes, image_paths = cached
+        try:
+            if all(os.stat(directory).st_mtime_ns == mtime and scanned_ns - mtime >= LISTING_MTIME_SLACK_NS
+                   for directory, mtime in mtimes.items()):
+                return list(image_paths)
+        except OSError:
+            pass  # A scanned directory is gone; rescan.
+    scanned_ns = time.time_ns()
+    mtimes, image_paths = _scan_folder(folder, recursive, key[2])
+    image_paths.sort(key=natural_key)
+    with _listings_lock:
+        _listings[key] = (scanned_ns, mtimes, image_paths)
+    return list(image_paths)
+
+
+# --- Instrumentation ---
+@contextmanager
+def timed(stats, stage):
+    # Adds the wall time of the block to stats[stage]; free when stats is None.
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats[stage] = stats.get(stage, 0.0) + time.perf_counter() - start
+
+
+# --- Detection ---
+def to_gray(image):
+    if len(image.shape) == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def native_threshold(brightness_threshold, dtype):
+    # The 0-255 slider threshold in the units of an image's own bit depth. For 16-bit data
+    # this selects exactly the pixels the old 8-bit conversion (value >> 8) would have.
+    if dtype == np.uint16:
+        return brightness_threshold * 256 + 255
+    if dtype.kind == "f":
+        return brightness_threshold / 255.0
+    return brightness_threshold
+
+
+def binarize(gray, brightness_threshold):
+    # 8-bit mask of pixels brighter than the threshold, for any input depth.
+    if gray.dtype == np.uint8:
+        _, thresh = cv2.threshold(gray, brightness_threshold, 255, cv2.THRESH_BINARY)
+        return thresh
+    return cv2.compare(gray, float(brightness_threshold), cv2.CMP_GT)
+
+
+def to_8bit(image):
+    if image.dtype == np.uint16:
+        return (image >> 8).astype(np.uint8)
+    if image.dtype.kind == "f":
+        return (np.clip(image, 0.0, 1.0) * 255).astype(np.uint8)
+    return image
+
+
+def auto_threshold(image, mode, percentile=50.0, max_side=512):
+    # Per-image threshold on the 0-255 scale, computed on a strided sample of at most
+    # max_side pixels per side so it costs next to nothing next to the decode. image may
+    # be a gray plane or the colour frame (only the sample is converted).
+    #   otsu: splits the histogram into two classes of minimal variance.
+    #   triangle: suits a small bright object on a large dark background.
+    #   percentile: halfway between the background level (the given percentile) and the
+    #   object level (the 99.5th percentile), so it follows lighting drift.
+    step = max(1, -(-max(image.shape[:2]) // max_side))
+    sample = to_8bit(to_gray(np.ascontiguousarray(image[::step, ::step])))
+    if mode == "otsu":
+        value, _ = cv2.threshold(sample, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        return int(value)
+    if mode == "triangle":
+        value, _ = cv2.threshold(sample, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_TRIANGLE)
+        return int(value)
+    if mode == "percentile":
+        cumulative = np.cumsum(np.bincount(sample.ravel(), minlength=256))
+        background = int(np.searchsorted(cumulative, cumulative[-1] * percentile / 100.0))
+        foreground = int(np.searchsorted(cumulative, cumulative[-1] * 0.995))
+        return (background + foreground) // 2
+    raise ValueError(f"Unknown threshold mode: {mode}")
+
+
+def apply_margin(bounding_rect, margin, shape):
+    x, y, w, h = bounding_rect
+    x = max(x - margin, 0)
+    y = max(y - margin, 0)
+    x2 = min(x + w + 2 * margin, shape[1])
+    y2 = min(y + h + 2 * margin, shape[0])
+    return x, y, x2, y2
+
+
+def find_object_rect(gray, brightness_threshold, stats=None):
+    # (x, y, w, h) of the largest bright contour at full resolution, or None.
+    with timed(stats, "threshold"):
+        thresh = binarize(gray, brightness_threshold)
+    with timed(stats, "findContours"):
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    largest_contour = max(contours, key=cv2.contourArea)
+    return cv2.boundingRect(largest_contour)
+
+
+def find_object_rect_proxy(gray, brightness_threshold, scale, stats=None):
+    # Like find_object_rect, but contours are only searched on a 1/scale proxy. Each proxy
+    # pixel is the max of its scale x scale block, so a block is bright exactly when it
+    # contains a bright full-res pixel and the coarse box never cuts the object. Bright specks
+    # within a block of the object merge into it on the proxy; the refinement drops a lone
+    # speck, but a cluster of them next to the object can still widen the box by up to two
+    # blocks. Only scale 1 is exact.
+    with timed(stats, "downscale"):
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (scale, scale))
+        proxy = cv2.dilate(gray, kernel, anchor=(0, 0))[::scale, ::scale]
+    with timed(stats, "threshold"):
+        thresh = binarize(proxy, brightness_threshold)
+    with timed(stats, "findContours"):
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    with timed(stats, "refine"):
+        return _refine_proxy_rect(gray, brightness_threshold, scale, thresh, contours, stats)
+
+
+def _refine_proxy_rect(gray, brightness_threshold, scale, thresh, contours, stats):
+    largest_contour = max(contours, key=cv2.contourArea)
+    px, py, pw, ph = cv2.boundingRect(largest_contour)
+    if pw < 4 or ph < 4:
+        return find_object_rect(gray, brightness_threshold, stats)  # Too small for the bands below.
+    # Only blocks belonging to the chosen contour may move an edge.
+    blocks = np.zeros(thresh.shape, np.uint8)
+    cv2.drawContours(blocks, [largest_contour], -1, 1, thickness=-1)
+    blocks = blocks[py:py + ph, px:px + pw]
+    height, width = gray.shape[:2]
+    x0, y0 = px * scale, py * scale
+    x1, y1 = min((px + pw) * scale, width), min((py + ph) * scale, height)
+    depth = 2 * scale
+
+    # Refine each edge inside a band two blocks thick at full resolution. Within a band, only
+    # pixels connected to its inner side count: the object continues inward, while a speck
+    # that merely merged into the object's outer blocks on the proxy does not reach that far.
+    def bright_in(y_start, y_end, x_start, x_end, inner):
+        band = gray[y_start:y_end, x_start:x_end] > brightness_threshold
+        rows = (np.arange(y_start, y_end) - y0) // scale
+        cols = (np.arange(x_start, x_end) - x0) // scale
+        band = (band & blocks[np.ix_(rows, cols)].astype(bool)).view(np.uint8)
+        _, labels = cv2.connectedComponents(band, connectivity=8)
+        edge = {"top": labels[-1], "bottom": labels[0], "left": labels[:, -1], "right": labels[:, 0]}[inner]
+        return np.isin(labels, edge[edge > 0])
+
+    top = bright_in(y0, y0 + depth, x0, x1, "top")
+    bottom_start = max(y1 - depth, y0)
+    bottom = bright_in(bottom_start, y1, x0, x1, "bottom")
+    left = bright_in(y0, y1, x0, x0 + depth, "left")
+    right_start = max(x1 - depth, x0)
+    right = bright_in(y0, y1, right_start, x1, "right")
+    if not (top.any() and bottom.any() and left.any() and right.any()):
+        return find_object_rect(gray, brightness_threshold, stats)
+    ry0 = y0 + int(np.argmax(top.any(axis=1)))
+    ry1 = bottom_start + bottom.shape[0] - int(np.argmax(bottom.any(axis=1)[::-1]))
+    rx0 = x0 + int(np.argmax(left.any(axis=0)))
+    rx1 = right_start + right.shape[1] - int(np.argmax(right.any(axis=0)[::-1]))
+    return rx0, ry0, rx1 - rx0, ry1 - ry0
+
+
+def find_object(gray, brightness_threshold, detection_scale=1, stats=None, strip_mb=0):
+    # The one choice between strip, proxy and exact detection, shared by the batch and the
+    # preview. With strip_mb > 0, gray may also be the colour image (converted strip by strip).
+    if strip_mb and strip_mb > 0:
+        return find_object_rect_strips(gray, brightness_threshold, strip_mb, stats=stats)
+    if detection_scale and detection_scale > 1:
+        return find_object_rect_proxy(gray, brightness_threshold, detection_scale, stats)
+    return find_object_rect(gray, brightness_threshold, stats)
+
+
+def find_crop_box(gray, brightness_threshold, margin, detection_scale=1, stats=None):
+    # Bounding box (x, y, x2, y2) of the largest bright contour plus margin, or None.
+    rect = find_object(gray, brightness_threshold, detection_scale, stats)
+    if rect is None:
+        return None
+    return apply_margin(rect, margin, gray.shape)
+
+
+def output_path_for(image_path, output_folder, prefix, output_format, source_root=None):
+    # With source_root (recursive runs), the image's subfolder below it is recreated in output_folder.
+    if source_root:
+        output_folder = os.path.join(output_folder, os.path.relpath(os.path.dirname(image_path), source_root))
+        os.makedirs(output_folder, exist_ok=True)
+    base_name = os.path.basename(image_path)
+    name, ext = os.path.splitext(base_name)
+    if prefix:
+        name = f"{prefix}_{name}"
+    if output_format == "TIFF":
+        ext = ".tif"
+    elif output_format == "PNG":
+        ext = ".png"
+    elif output_format == "JPG":
+        ext = ".jpg"
+    return os.path.join(output_folder, name + ext)
+
+
+# --- Processing ---
+# The stages of process_image, also run separately by the batch pipeline.
+def load_image(image_path, stats=None, preserve_depth=False):
+    # preserve_depth keeps 16-bit/float data and single-channel images as stored instead of
+    # expanding everything to 8-bit BGR. (IMREAD_UNCHANGED would also skip EXIF rotation.)
+    flags = cv2.IMREAD_ANYDEPTH | cv2.IMREAD_ANYCOLOR if preserve_depth else cv2.IMREAD_COLOR
+    with timed(stats, "imread"):
+        image = cv2.imread(image_path, flags)
+    if stats is not None:
+        stats["bytes_read"] = os.path.getsize(image_path)
+        if image is not None:
+            stats["height"], stats["width"] = image.shape[:2]
+            stats["channels"] = image.shape[2] if image.ndim == 3 else 1
+            stats["dtype"] = str(image.dtype)
+    return image
+
+
+def pick_threshold(image, brightness_threshold, stats=None, threshold_mode="manual", threshold_percentile=50.0):
+    # Threshold for image in its own units. brightness_threshold is on the 0-255 scale whatever
+    # the image's bit depth, and is replaced by a per-image value unless threshold_mode is
+    # "manual". The 0-255 value used is kept in stats["brightness_threshold"].
+    if threshold_mode != "manual":
+        with timed(stats, "autoThreshold"):
+            brightness_threshold = auto_threshold(image, threshold_mode, threshold_percentile)
+    if stats is not None:
+        stats["brightness_threshold"] = brightness_threshold
+    return native_threshold(brightness_threshold, image.dtype)
+
+
+def gray_and_threshold(image, brightness_threshold, stats=None, threshold_mode="manual", threshold_percentile=50.0):
+    # (gray plane, threshold in the gray plane's own units).
+    threshold = pick_threshold(image, brightness_threshold, stats, threshold_mode, threshold_percentile)
+    with timed(stats, "cvtColor"):
+        gray = to_gray(image)
+    return gray, threshold
+
+
+def find_object_rect_strips(image, brightness_threshold, strip_mb, min_pixels=4, stats=None):
+    # (x, y, w, h) spanned by the rows and columns holding at least min_pixels bright pixels,
+    # or None. The frame is converted and thresholded a strip of rows at a time, keeping only
+    # per-row and per-column counts, so no full-size gray plane, mask or proxy is allocated and
+    # the working memory stays under strip_mb. Unlike find_object_rect this covers every bright
+    # region, not just the largest contour; min_pixels keeps isolated specks from widening it.
+    height, width = image.shape[:2]
+    # Gray strip plus its mask, twice: the previous strip's are still alive while the next is made.
+    row_bytes = 2 * width * (image.dtype.itemsize + 1)
+    rows = max(1, int(strip_mb * 1024 * 1024) // row_bytes)
+    row_counts = np.zeros(height, np.int64)
+    col_counts = np.zeros(width, np.int64)
+    for start in range(0, height, rows):
+        with timed(stats, "cvtColor"):
+            gray = to_gray(image[start:start + rows])
+        with timed(stats, "threshold"):
+            mask = binarize(gray, brightness_threshold)
+        with timed(stats, "extents"):
+            end = start + gray.shape[0]
+            row_counts[start:end] = cv2.reduce(mask, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S)[:, 0] // 255
+            col_counts += cv2.reduce(mask, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S)[0] // 255
+    bright_rows = np.flatnonzero(row_counts >= min_pixels)
+    bright_cols = np.flatnonzero(col_counts >= min_pixels)
+    if len(bright_rows) == 0 or len(bright_cols) == 0:
+        return None
+    x, y = int(bright_cols[0]), int(bright_rows[0])
+    return x, y, int(bright_cols[-1]) + 1 - x, int(bright_rows[-1]) + 1 - y
+
+
+def detect_box(image, brightness_threshold, margin, detection_scale=1, stats=None, threshold_mode="manual",
+               threshold_percentile=50.0, strip_mb=0):
+    # Crop box of image, or None if no bright object was found. strip_mb > 0 selects the
+    # memory-bounded strip detection (detection_scale then does not apply).
+    if strip_mb and strip_mb > 0:
+        # No full-size gray plane: the strips are converted one at a time.
+        gray, threshold = image, pick_threshold(image, brightness_threshold, stats, threshold_mode,
+                                                threshold_percentile)
+    else:
+        gray, threshold = gray_and_threshold(image, brightness_threshold, stats, threshold_mode, threshold_percentile)
+    rect = find_object(gray, threshold, detection_scale, stats, strip_mb)
+    return None if rect is None else apply_margin(rect, margin, gray.shape)
+
+
+def encode_params(ext, jpeg_quality=95, png_compression=1, tiff_compression="lzw"):
+    if ext in JPEG_EXTENSIONS:
+        return [cv2.IMWRITE_JPEG_QUALITY, int(jpeg_quality)]
+    if ext == ".png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+    if ext in (".tif", ".tiff"):
+        return [cv2.IMWRITE_TIFF_COMPRESSION, TIFF_COMPRESSIONS[tiff_compression]]
+    return []
+
+
+def write_image(output_path, cropped, stats=None, jpeg_quality=95, png_compression=1, tiff_compression="lzw"):
+    # TIFF keeps any depth and PNG keeps 16-bit; anything else is reduced to 8-bit. The crop is
+    # passed to imwrite as a strided view of the decoded frame, so no pixels are copied first.
+    ext = os.path.splitext(output_path)[1].lower()
+    if cropped.dtype != np.uint8 and ext not in (".tif", ".tiff"):
+        if not (ext == ".png" and cropped.dtype == np.uint16):
+            cropped = to_8bit(cropped)
+    with timed(stats, "imwrite"):
+        cv2.imwrite(output_path, cropped, encode_params(ext, jpeg_quality, png_compression, tiff_compression))
+    if stats is not None:
+        stats["bytes_written"] = os.path.getsize(output_path)
+
+
+def jpeg_layout(image_path):
+    # (MCU width, MCU height, EXIF orientation) of a JPEG file.
+    from PIL import Image
+    with Image.open(image_path) as im:
+        h_max = max(layer[1] for layer in im.layer)
+        v_max = max(layer[2] for layer in im.layer)
+        orientation = im.getexif().get(0x0112, 1)
+    return 8 * h_max, 8 * v_max, orientation
+
+
+def crop_jpeg_lossless(image_path, output_path, box, stats=None):
+    # Crops the JPEG's DCT blocks with jpegtran instead of decoding and re-encoding, so there is
+    # no generation loss and no encode cost. The top-left corner is moved out to the MCU grid
+    # (the margin grows by up to one block). Returns False if jpegtran is not installed or the
+    # file needs EXIF rotation, since the box is in rotated coordinates.
+    jpegtran = shutil.which("jpegtran")
+    if jpegtran is None:
+        return False
+    try:
+        mcu_width, mcu_height, orientation = jpeg_layout(image_path)
+    except Exception as e:
+        print(f"Could not read JPEG layout of {image_path}: {e}")
+        return False
+    if orientation != 1:
+        return False
+    x, y, x2, y2 = box
+    x -= x % mcu_width
+    y -= y % mcu_height
+    command = [jpegtran, "-crop", f"{x2 - x}x{y2 - y}+{x}+{y}", "-copy", "all", "-outfile", output_path, image_path]
+    with timed(stats, "imwrite"):
+        result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        print(f"jpegtran failed for {image_path}: {result.stderr.decode(errors='replace').strip()}")
+        return False
+    if stats is not None:
+        stats["bytes_written"] = os.path.getsize(output_path)
+    return True
+
+
+def save_crop(image_path, output_path, image, box, stats=None, lossless_jpeg=False, jpeg_quality=95,
+              png_compression=1, tiff_compression="lzw"):
+    # Writes image[box] to output_path, losslessly for JPEG -> JPEG when enabled and possible.
+    if (lossless_jpeg and os.path.splitext(image_path)[1].lower() in JPEG_EXTENSIONS
+            and os.path.splitext(output_path)[1].lower() in JPEG_EXTENSIONS):
+        if crop_jpeg_lossless(image_path, output_path, box, stats):
+            return
+    x, y, x2, y2 = box
+    write_image(output_path, image[y:y2, x:x2], stats, jpeg_quality, png_compression, tiff_compression)
+
+
+def process_image(image_path, output_folder, brightness_threshold, margin, prefix, output_format, detection_scale=1,
+                  stats=None, preserve_depth=False, lossless_jpeg=False, jpeg_quality=95, png_compression=1,
+                  tiff_compression="lzw", threshold_mode="manual", threshold_percentile=50.0, strip_mb=0,
+                  source_root=None):
+    # Returns the written output path, or None if the image was skipped. If stats is a dict,
+    # per-stage wall times, byte counts and the decoded dimensions are recorded in it.
+    image = load_image(image_path, stats, preserve_depth)
+    if image is None:
+        print(f"Could not read {image_path}")
+        return None
+    box = detect_box(image, brightness_threshold, margin, detection_scale, stats, threshold_mode, threshold_percentile,
+                     strip_mb)
+    if box is None:
+        print(f"No bright object found in {image_path}. Skipping.")
+        return None
+    output_path = output_path_for(image_path, output_folder, prefix, output_format, source_root)
+    save_crop(image_path, output_path, image, box, stats, lossless_jpeg, jpeg_quality, png_compression,
+              tiff_compression)
+    print(f"Saved cropped image to {output_path}")
+    return output_path
@@ -0,0 +1,152 @@
+import queue
+import threading
+from crop_core import load_image, detect_box, save_crop, output_path_for, ENCODE_OPTION_KEYS
+from crop_batch import BatchProcessor, Manifest, pool_limits, skip_up_to_date, records_threshold, result_reporter
+from sequence_tracking import SequenceProcessor
+
+STAGES = ["read", "crop", "write"]
+_DONE = object()  # Sentinel passed down the queues once a stage has no more work.
+
+
+def make_processor(engine, workers=0, max_in_flight=0, io_threads=2, sequence_chunk=16, uniform_crop=False):
+    # "pool" crops whole images in worker processes; "pipeline" overlaps reading, cropping
+    # and writing on threads; "sequence" tracks the object from frame to frame in worker
+    # processes. All expose the same run() interface.
+    if engine == "pipeline":
+        return CropPipeline(io_threads, workers, io_threads, max_in_flight or 8)
+    if engine == "sequence":
+        return SequenceProcessor(workers, max_in_flight, sequence_chunk, uniform_crop)
+    return BatchProcessor(workers, max_in_flight)
+
+
+class CropPipeline:
+    # Streams images through decoder threads -> crop threads -> encoder/writer threads with
+    # bounded queues between the stages, so disk reads, contour detection and encoding overlap
+    # and batch time approaches the slowest stage instead of the sum of all three. OpenCV
+    # releases the GIL inside imread, findContours and imwrite, so plain threads are enough.
+    # on_result has the same signature and calling thread as BatchProcessor's.
+    def __init__(self, readers=2, croppers=0, writers=2, queue_size=8):
+        self.counts = {"read": max(1, readers),
+                       "crop": pool_limits(croppers)[0],
+                       "write": max(1, writers)}
+        self.queue_size = queue_size
+        self.queues = {}
+        self.skipped = 0
+        self.collect_stats = False
+
+    def queue_depths(self):
+        # Items waiting in front of each stage; the stage with the fullest queue is the bottleneck.
+        return {stage: q.qsize() for stage, q in self.queues.items()}
+
+    def run(self, image_paths, output_folder, brightness_threshold, margin, prefix, output_format,
+            on_result=None, cancel_event=None, incremental=False, on_status=None, status_interval=0.5,
+            run_stats=None, **options):
+        # on_status(queue_depths) is called from this thread every status_interval seconds.
+        # run_stats works as in BatchProcessor.run.
+        manifest = Manifest(output_folder) if incremental else None
+        params = Manifest.params(brightness_threshold, margin, prefix, output_format, **options)
+        work, self.skipped = skip_up_to_date(manifest, image_paths, params, on_result)
+        processed = self.skipped
+        finish = result_reporter(manifest, params, run_stats, on_result)
+
+        self.queues = {stage: queue.Queue(maxsize=self.queue_size) for stage in STAGES}
+        results = queue.Queue()
+
+        self.collect_stats = run_stats is not None or records_threshold(options)
+
+        def read(image_path, _, stats):
+            image = load_image(image_path, stats, options.get("preserve_depth", False))
+            if image is None:
+                print(f"Could not read {image_path}")
+            return image
+
+        def crop(image_path, image, stats):
+            box = detect_box(image, brightness_threshold, margin, options.get("detection_scale", 1), stats,
+                             options.get("threshold_mode", "manual"), options.get("threshold_percentile", 50.0),
+                             options.get("strip_mb", 0))
+            if box is None:
+                print(f"No bright object found in {image_path}. Skipping.")
+                return None
+            return image, box
+
+        encode_options = {key: options[key] for key in ENCODE_OPTION_KEYS if key in options}
+
+        def write(image_path, payload, stats):
+            image, box = payload
+            output_path = output_path_for(image_path, output_folder, prefix, output_format,
+                                          options.get("source_root"))
+            save_crop(image_path, output_path, image, box, stats, **encode_options)
+            print(f"Saved cropped image to {output_path}")
+            return output_path
+
+        functions = {"read": read, "crop": crop, "write": write}
+        threads = [threading.Thread(target=self._feed, args=(work, cancel_event), daemon=True)]
+        for position, stage in enumerate(STAGES):
+            out_queue = self.queues[STAGES[position + 1]] if position + 1 < len(STAGES) else results
+            finished = {"remaining": self.counts[stage], "lock": threading.Lock()}
+            for _ in range(self.counts[stage]):
+                threads.append(threading.Thread(
+                    target=self._stage_worker,
+                    args=(stage, functions[stage], out_queue, results, finished), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                try:
+                    item = results.get(timeout=status_interval)
+                except queue.Empty:
+                    if on_status is not None:
+                        on_status(self.queue_depths())
+                    continue
+                if item is _DONE:
+                    break
+                processed += 1
+                finish(*item)
+        finally:
+            if manifest is not None:
+                manifest.close()
+        for thread in threads:
+            thread.join()
+        return processed
+
+    def _feed(self, work, cancel_event):
+        for index, image_path in work:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            self.queues["read"].put((index, image_path, None, {} if self.collect_stats else None))
+        for _ in range(self.counts["read"]):
+            self.queues["read"].put(_DONE)
+
+    def _stage_worker(self, stage, function, out_queue, results, finished):
+        in_queue = self.queues[stage]
+        is_last = out_queue is results
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                break
+            index, image_path, payload, stats = item
+            try:
+                value = function(image_path, payload, stats)
+            except Exception as e:
+                print(f"Failed to process {image_path}: {e}")
+                results.put((index, image_path, None, str(e), stats))
+                continue
+            if value is None:
+                # Unreadable or no bright object: done, nothing for the later stages.
+                results.put((index, image_path, None, None, stats))
+            elif is_last:
+                results.put((index, image_path, value, None, stats))
+            else:
+                out_queue.put((index, image_path, value, stats))
+        # The last thread of a stage to finish tells the next stage (or the caller) to stop.
+        with finished["lock"]:
+            finished["remaining"] -= 1
+            last = finished["remaining"] == 0
+        if last:
+            if is_last:
+                results.put(_DONE)
+            else:
+                next_stage = STAGES[STAGES.index(stage) + 1]
+                for _ in range(self.counts[next_stage]):
+                    out_queue.put(_DONE)
@@ -0,0 +1,226 @@
+import os
+import threading
+from collections import OrderedDict
+import cv2
+from crop_core import to_gray, find_object, apply_margin
+
+
+class ImageCache:
+    # Bounded LRU of decoded images and their grayscale planes, keyed by (path, mtime)
+    # so an edited file is decoded again. Detection results are cached separately per
+    # (image, threshold, detection scale): the margin is applied on top, so margin changes
+    # never re-run contour detection. With strip_mb > 0 the preview uses the same strip
+    # detection as the batch. Safe to share between the GUI and loader threads.
+    def __init__(self, budget_mb=512, max_detections=1024):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.max_detections = max_detections
+        self.used_bytes = 0
+        self.images = OrderedDict()
+        self.detections = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading = {}  # key -> Event for decodes in progress, so two threads never decode the same file.
+
+    @staticmethod
+    def key_for(path):
+        try:
+            return path, os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def get(self, path):
+        # Returns (image, gray) if cached, else None. Does not touch the disk beyond a stat.
+        key = self.key_for(path)
+        if key is None:
+            return None
+        with self.lock:
+            entry = self.images.get(key)
+            if entry is not None:
+                self.images.move_to_end(key)
+            return entry
+
+    def load(self, path):
+        # Returns (image, gray), decoding on a miss, or None if the file cannot be read.
+        entry = self.get(path)
+        if entry is not None:
+            return entry
+        key = self.key_for(path)
+        if key is None:
+            return None
+        with self.lock:
+            event = self.loading.get(key)
+            owner = event is None
+            if owner:
+                event = self.loading[key] = threading.Event()
+        if not owner:
+            event.wait()
+            return self.get(path)
+        try:
+            image = cv2.imread(path)
+            if image is None:
+                return None
+            entry = (image, to_gray(image))
+            self.put(key, entry)
+            return entry
+        finally:
+            with self.lock:
+                del self.loading[key]
+            event.set()
+
+    def put(self, key, entry):
+        image, gray = entry
+        size = image.nbytes + (gray.nbytes if gray is not image else 0)
+        with self.lock:
+            if key in self.images:
+                return
+            self.images[key] = entry
+            self.used_bytes += size
+            # Always keep the newest entry, even if it alone exceeds the budget.
+            while self.used_bytes > self.budget_bytes and len(self.images) > 1:
+                _, (old_image, old_gray) = self.images.popitem(last=False)
+                self.used_bytes -= old_image.nbytes + (old_gray.nbytes if old_gray is not old_image else 0)
+
+    def __contains__(self, path):
+        key = self.key_for(path)
+        with self.lock:
+            return key is not None and key in self.images
+
+    def detect(self, path, gray, brightness_threshold, detection_scale=1, strip_mb=0):
+        # Object rect (x, y, w, h) for gray at the given threshold, or None if nothing is bright.
+        key = (self.key_for(path), brightness_threshold, detection_scale, strip_mb)
+        with self.lock:
+            if key in self.detections:
+                self.detections.move_to_end(key)
+                return self.detections[key]
+        rect = find_object(gray, brightness_threshold, detection_scale, strip_mb=strip_mb)
+        with self.lock:
+            self.detections[key] = rect
+            while len(self.detections) > self.max_detections:
+                self.detections.popitem(last=False)
+        return rect
+
+    def crop_box(self, path, gray, brightness_threshold, margin, detection_scale=1, strip_mb=0):
+        rect = self.detect(path, gray, brightness_threshold, detection_scale, strip_mb)
+        if rect is None:
+            return None
+        return apply_margin(rect, margin, gray.shape)
+
+    def clear(self):
+        with self.lock:
+            self.images.clear()
+            self.detections.clear()
+            self.used_bytes = 0
+
+
+class Prefetcher:
+    # Decodes the neighbours of the displayed image into an ImageCache on a background
+    # thread. Each schedule() replaces the pending work, so prefetches for a position the
+    # user has already jumped away from are dropped (a decode already running finishes).
+    def __init__(self, cache, radius=2, jump=10):
+        self.cache = cache
+        self.radius = radius
+        self.jump = jump
+        self.pending = []
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def targets(self, image_list, index):
+        # Nearest frames first, alternating forward/backward, then the +-jump frames.
+        # Clamped like the navigation buttons, so a jump near either end prefetches the end frame.
+        offsets = []
+        for step in range(1, self.radius + 1):
+            offsets.extend((step, -step))
+        if self.jump > self.radius:
+            offsets.extend((self.jump, -self.jump))
+        paths = []
+        for offset in offsets:
+            target = max(0, min(index + offset, len(image_list) - 1))
+            if target != index and image_list[target] not in paths:
+                paths.append(image_list[target])
+        return paths
+
+    def schedule(self, image_list, index):
+        paths = self.targets(image_list, index)
+        with self.condition:
+            self.pending = paths
+            self.condition.notify()
+
+    def cancel(self):
+        with self.condition:
+            self.pending = []
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.pending = []
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                path = self.pending.pop(0)
+            if path not in self.cache:
+                self.cache.load(path)
+
+
+class DetectionWorker:
+    # Runs crop-box detection for the preview off the GUI thread. Only the newest request
+    # is kept: submitting while busy replaces the pending one, so dragging a slider computes
+    # at most the value already in progress plus the latest one.
+    def __init__(self, cache):
+        self.cache = cache
+        self.pending = None
+        self.result = None
+        self.busy = False
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, path, gray, brightness_threshold, margin, detection_scale=1, strip_mb=0):
+        with self.condition:
+            self.pending = (path, gray, brightness_threshold, margin, detection_scale, strip_mb)
+            self.condition.notify()
+
+    def take_result(self):
+        # (path, box) of the newest finished request, or None.
+        with self.condition:
+            result = self.result
+            self.result = None
+            return result
+
+    def idle(self):
+        with self.condition:
+            return self.pending is None and not self.busy
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.pending = None
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                request = self.pending
+                self.pending = None
+                self.busy = True
+            box = None
+            try:
+                box = self.cache.crop_box(*request)
+            except Exception as e:
+                print(e)
+            with self.condition:
+                self.busy = False
+                # A newer request supersedes this result.
+                if self.pending is None:
+                    self.result = (request[0], box)
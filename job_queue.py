@@ -0,0 +1,348 @@
+# Queue of crop jobs (one scan session each: folders plus crop parameters), persisted next to
+# settings.json so queued sessions survive a restart. From the command line:
+#   python job_queue.py add /scans/mon /scans/mon_crop --threshold 190 --prefix mon
+#   python job_queue.py list
+#   python job_queue.py run
+import argparse
+import os
+import json
+import sys
+import time
+import threading
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from crop_core import DEFAULT_SETTINGS, OUTPUT_FORMATS, SETTINGS_FILE, load_settings, list_images, crop_options
+from crop_batch import (Manifest, init_worker, pool_limits, process_with_stats, records_threshold,
+                        skip_up_to_date)
+
+JOBS_FILE = "crop_jobs.json"
+FINISHED = ("done", "cancelled", "failed")
+LOCK_TIMEOUT = 10  # Seconds after which a leftover lock file is considered stale.
+STALE_AFTER = 60  # Seconds without a heartbeat after which a running job's runner is presumed dead.
+
+
+def is_stale(job):
+    # Running jobs carry the time their runner last saved them; a runner that was killed stops
+    # updating it, and its jobs can then be claimed again (the output manifest lets them resume).
+    return job["status"] == "running" and time.time() - job.get("heartbeat", 0) > STALE_AFTER
+
+
+class JobQueue:
+    # Jobs are plain dicts: id, folders, crop parameters and options, status ("queued",
+    # "running", "done", "cancelled" or "failed") and progress counters. The file is the
+    # source of truth: every change re-reads it, applies the change and writes it back through
+    # a temp file while holding a lock file, so the GUI, a runner and "job_queue.py add" in
+    # another terminal never overwrite each other. self.jobs is the copy last read.
+    def __init__(self, path=JOBS_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.jobs = self.read()
+
+    def read(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    return json.load(f)
+            except Exception as e:
+                print(e)
+        return []
+
+    def write(self):
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self.jobs, f, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save job queue: {e}")
+
+    @contextmanager
+    def locked(self):
+        # O_EXCL lock file: works the same on Windows and Linux. Changes take milliseconds, so
+        # a lock file older than LOCK_TIMEOUT was left behind by a killed process.
+        lock_path = self.path + ".lock"
+        with self.lock:
+            while True:
+                try:
+                    fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                    break
+                except FileExistsError:
+                    try:
+                        if time.time() - os.path.getmtime(lock_path) > LOCK_TIMEOUT:
+                            os.remove(lock_path)
+                    except OSError:
+                        pass
+                    time.sleep(0.01)
+            try:
+                yield
+            finally:
+                os.close(fd)
+                os.remove(lock_path)
+
+    @contextmanager
+    def change(self):
+        # Yields the jobs as currently on disk; they are written back afterwards if changed.
+        with self.locked():
+            self.jobs = self.read()
+            before = json.dumps(self.jobs)
+            yield self.jobs
+            if json.dumps(self.jobs) != before:
+                self.write()
+
+    def refresh(self):
+        with self.locked():
+            self.jobs = self.read()
+
+    def add(self, input_folder, output_folder, brightness_threshold, margin, prefix, output_format, **options):
+        with self.change() as jobs:
+            job = {"id": max((job["id"] for job in jobs), default=0) + 1,
+                   "input_folder": input_folder, "output_folder": output_folder,
+                   "threshold": brightness_threshold, "margin": margin, "prefix": prefix,
+                   "output_format": output_format, "options": options, "status": "queued",
+                   "total": 0, "done": 0, "skipped": 0, "errors": 0}
+            jobs.append(job)
+        return job["id"]
+
+    def snapshot(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs]
+
+    def get(self, job_id):
+        with self.lock:
+            for job in self.jobs:
+                if job["id"] == job_id:
+                    return dict(job)
+        return None
+
+    def update(self, job_id, **fields):
+        with self.change() as jobs:
+            for job in jobs:
+                if job["id"] == job_id:
+                    job.update(fields)
+
+    def finish(self, job_id, status, **fields):
+        # Like update, but keeps a status another process set meanwhile (e.g. "cancelled").
+        with self.change() as jobs:
+            for job in jobs:
+                if job["id"] == job_id:
+                    job.update(fields)
+                    if job["status"] == "running":
+                        job["status"] = status
+
+    def heartbeat(self, counters):
+        # Saves {job_id: {field: value}} for the caller's running jobs and marks them alive.
+        with self.change() as jobs:
+            for job in jobs:
+                if job["id"] in counters and job["status"] == "running":
+                    job.update(counters[job["id"]], heartbeat=time.time())
+
+    def cancel(self, job_id):
+        # A running job stops submitting files; those already being cropped still finish.
+        with self.change() as jobs:
+            for job in jobs:
+                if job["id"] == job_id and job["status"] not in FINISHED:
+                    job["status"] = "cancelled"
+
+    def clear_finished(self):
+        with self.change() as jobs:
+            jobs[:] = [job for job in jobs if job["status"] not in FINISHED]
+
+    def next_queued(self):
+        # Claims a job under the lock, so two runners never get the same one.
+        with self.change() as jobs:
+            for job in jobs:
+                if job["status"] == "queued" or is_stale(job):
+                    job.update(status="running", heartbeat=time.time())
+                    return dict(job)
+        return None
+
+
+class JobRunner:
+    # Runs queued jobs on one shared process pool. Files of all running jobs are submitted
+    # round-robin, so a session's last files overlap with the next session's first ones and the
+    # pool never drains between jobs; jobs queued while it runs are picked up as well.
+    # on_progress(job) is called from the calling thread whenever a job's counters or status change.
+    def __init__(self, jobs, workers=0, max_in_flight=0, max_active=2):
+        self.jobs = jobs
+        self.workers, self.max_in_flight = pool_limits(workers, max_in_flight)
+        self.max_active = max(1, max_active)
+        self.progress_interval = 1.0  # Seconds between saves of the counters and the heartbeat.
+
+    def start_job(self, job):
+        options = dict(job["options"])
+        recursive = "source_root" in options
+        if not os.path.isdir(job["input_folder"]):
+            print(f"Input folder of job {job['id']} does not exist: {job['input_folder']}")
+            self.jobs.update(job["id"], status="failed")
+            return None
+        try:
+            os.makedirs(job["output_folder"], exist_ok=True)
+            image_paths = list_images(job["input_folder"], recursive, [job["output_folder"]])
+            manifest = Manifest(job["output_folder"])
+        except OSError as e:
+            print(f"Could not start job {job['id']}: {e}")
+            self.jobs.update(job["id"], status="failed")
+            return None
+        params = Manifest.params(job["threshold"], job["margin"], job["prefix"], job["output_format"], **options)
+        work, skipped = skip_up_to_date(manifest, image_paths, params)
+        self.jobs.update(job["id"], total=len(image_paths), done=skipped, skipped=skipped, errors=0)
+        options["collect_stats"] = records_threshold(options)
+        return {"id": job["id"], "work": iter(work), "manifest": manifest, "params": params, "in_flight": 0,
+                "args": (job["output_folder"], job["threshold"], job["margin"], job["prefix"], job["output_format"]),
+                "options": options, "done": skipped, "errors": 0, "exhausted": False}
+
+    def run(self, stop_event=None, on_progress=None, status_interval=0.5):
+        # Returns when no queued jobs are left, or after stop_event is set and the files in
+        # flight have finished (the stopped jobs are queued again and resume next time).
+        active = {}
+        order = deque()
+        pending = {}
+        last_save = last_claim = time.monotonic()
+
+        def report(job_id):
+            if on_progress is not None:
+                job = self.jobs.get(job_id)
+                if job_id in active:
+                    # Counters are only saved every progress_interval; report the live ones.
+                    job.update(done=active[job_id]["done"], errors=active[job_id]["errors"])
+                on_progress(job)
+
+        def finish_job(state, status):
+            state["manifest"].close()
+            del active[state["id"]]
+            if state["id"] in order:
+                order.remove(state["id"])
+            self.jobs.finish(state["id"], status, done=state["done"], errors=state["errors"])
+            report(state["id"])
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker) as executor:
+            while True:
+                stopping = stop_event is not None and stop_event.is_set()
+                # With a job already running, look for the next one only every progress_interval.
+                claim = not active or time.monotonic() - last_claim >= self.progress_interval
+                while claim and not stopping and len(active) < self.max_active:
+                    last_claim = time.monotonic()
+                    job = self.jobs.next_queued()
+                    if job is None:
+                        break
+                    state = self.start_job(job)
+                    if state is not None:
+                        active[job["id"]] = state
+                        order.append(job["id"])
+                    report(job["id"])
+
+                # Round-robin over the running jobs until the pool has enough work.
+                while not stopping and order and len(pending) < self.max_in_flight:
+                    job_id = order[0]
+                    order.rotate(-1)
+                    state = active[job_id]
+                    if self.jobs.get(job_id)["status"] == "cancelled":
+                        state["exhausted"] = True
+                    item = None if state["exhausted"] else next(state["work"], None)
+                    if item is None:
+                        state["exhausted"] = True
+                        order.remove(job_id)
+                        continue
+                    _, image_path = item
+                    future = executor.submit(process_with_stats, image_path, *state["args"], **state["options"])
+                    pending[future] = (job_id, image_path)
+                    state["in_flight"] += 1
+
+                for state in list(active.values()):
+                    if state["in_flight"] == 0 and (state["exhausted"] or stopping):
+                        finish_job(state, "queued" if stopping and not state["exhausted"] else "done")
+                if not pending:
+                    if not active:
+                        self.jobs.refresh()
+                        if stopping or not any(job["status"] == "queued" for job in self.jobs.snapshot()):
+                            break
+                    continue
+
+                done, _ = wait(pending, timeout=status_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id, image_path = pending.pop(future)
+                    state = active[job_id]
+                    state["in_flight"] -= 1
+                    try:
+                        output_path, stats = future.result()
+                        state["manifest"].record(image_path, state["params"], output_path,
+                                                 (stats or {}).get("brightness_threshold"))
+                    except Exception as e:
+                        state["errors"] += 1
+                        print(f"Failed to process {image_path}: {e}")
+                    state["done"] += 1
+                    report(job_id)
+                now = time.monotonic()
+                if now - last_save >= self.progress_interval:
+                    # Also tells other processes this runner is alive, and notices cancellations.
+                    last_save = now
+                    self.jobs.heartbeat({job_id: {"done": state["done"], "errors": state["errors"]}
+                                         for job_id, state in active.items()})
+        return self.jobs.snapshot()
+
+
+def describe(job):
+    status = "stalled" if is_stale(job) else job["status"]
+    progress = f"{job['done']}/{job['total']}" if job["total"] else ""
+    errors = f", {job['errors']} errors" if job["errors"] else ""
+    return f"#{job['id']} {status:<9} {progress:>11}{errors}  {job['input_folder']} -> {job['output_folder']}"
+
+
+def main(argv=None):
+    settings = load_settings(SETTINGS_FILE)
+    for key, value in DEFAULT_SETTINGS.items():
+        settings.setdefault(key, value)
+    parser = argparse.ArgumentParser(description="Queue and run crop jobs for several scan sessions.")
+    parser.add_argument("--jobs-file", default=JOBS_FILE, help="job queue file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="queue a folder; unspecified options come from settings.json")
+    add.add_argument("input_folder")
+    add.add_argument("output_folder")
+    add.add_argument("-t", "--threshold", type=int, default=settings["threshold"])
+    add.add_argument("-m", "--margin", type=int, default=settings["margin"])
+    add.add_argument("-p", "--prefix", default=settings["custom_prefix"])
+    add.add_argument("-f", "--format", dest="output_format", choices=OUTPUT_FORMATS, default=settings["output_format"])
+    add.add_argument("-r", "--recursive", action=argparse.BooleanOptionalAction, default=settings["recursive"])
+    commands.add_parser("list", help="show queued, running and finished jobs")
+    cancel = commands.add_parser("cancel", help="cancel a job")
+    cancel.add_argument("job_id", type=int)
+    commands.add_parser("clear", help="remove finished and cancelled jobs")
+    run = commands.add_parser("run", help="run all queued jobs on one worker pool")
+    run.add_argument("-j", "--jobs", type=int, default=settings["workers"],
+                     help="worker processes, 0 = one per CPU core (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    jobs = JobQueue(args.jobs_file)
+    if args.command == "add":
+        settings["recursive"] = args.recursive
+        job_id = jobs.add(os.path.abspath(args.input_folder), os.path.abspath(args.output_folder), args.threshold,
+                          args.margin, args.prefix.strip(), args.output_format,
+                          **crop_options(settings, os.path.abspath(args.input_folder)))
+        print(f"Queued job #{job_id}.")
+    elif args.command == "list":
+        for job in jobs.snapshot():
+            print(describe(job))
+    elif args.command == "cancel":
+        jobs.cancel(args.job_id)
+    elif args.command == "clear":
+        jobs.clear_finished()
+    elif args.command == "run":
+        runner = JobRunner(jobs, args.jobs, settings["max_in_flight"])
+        stop_event = threading.Event()
+
+        def on_progress(job):
+            if job["status"] != "running" or job["done"] == job["total"]:
+                print(describe(job))
+
+        try:
+            runner.run(stop_event, on_progress)
+        except KeyboardInterrupt:
+            print("Stopped; unfinished jobs stay queued.")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import os
+import csv
+import json
+import time
+import numpy as np
+
+# Written to the output folder when a batch runs with statistics enabled.
+SUMMARY_FILE = "crop_stats_summary.json"
+FILES_FILE = "crop_stats_files.csv"
+TIME_STAGES = ["imread", "cvtColor", "autoThreshold", "downscale", "threshold", "extents", "findContours", "refine",
+               "imwrite"]
+FILE_COLUMNS = ["source", "output", "error", "brightness_threshold", "tracking", "width", "height", "channels",
+                "bytes_read", "bytes_written"]
+
+
+class RunStats:
+    # Collects the per-image stats dicts filled in by crop_core.process_image during a batch
+    # and writes a per-file CSV plus an aggregated summary (p50/p95 per stage, throughput).
+    def __init__(self):
+        self.files = []
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def add(self, image_path, output_path, error, stats):
+        row = dict(stats or {})
+        row.update({"source": image_path, "output": output_path, "error": error})
+        self.files.append(row)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        bytes_read = sum(row.get("bytes_read", 0) for row in self.files)
+        bytes_written = sum(row.get("bytes_written", 0) for row in self.files)
+        stages = {}
+        for stage in TIME_STAGES:
+            values = [row[stage] * 1000 for row in self.files if stage in row]
+            if values:
+                stages[stage] = {"p50_ms": round(float(np.percentile(values, 50)), 3),
+                                 "p95_ms": round(float(np.percentile(values, 95)), 3),
+                                 "total_s": round(sum(values) / 1000, 3)}
+        return {
+            "images": len(self.files),
+            "errors": sum(1 for row in self.files if row["error"]),
+            "seconds": round(elapsed, 3),
+            "images_per_second": round(len(self.files) / elapsed, 3) if elapsed > 0 else None,
+            "mb_read_per_second": round(bytes_read / 1e6 / elapsed, 3) if elapsed > 0 else None,
+            "mb_written_per_second": round(bytes_written / 1e6 / elapsed, 3) if elapsed > 0 else None,
+            "stages": stages,
+        }
+
+    def write(self, folder):
+        self.finish()
+        with open(os.path.join(folder, SUMMARY_FILE), "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        columns = FILE_COLUMNS + [stage + "_ms" for stage in TIME_STAGES]
+        with open(os.path.join(folder, FILES_FILE), "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for row in self.files:
+                out = {column: row.get(column) for column in FILE_COLUMNS}
+                for stage in TIME_STAGES:
+                    if stage in row:
+                        out[stage + "_ms"] = round(row[stage] * 1000, 3)
+                writer.writerow(out)
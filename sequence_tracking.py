@@ -0,0 +1,212 @@
+from concurrent.futures import ProcessPoolExecutor
+from crop_core import (ENCODE_OPTION_KEYS, load_image, gray_and_threshold, find_object, apply_margin, save_crop,
+                       output_path_for)
+from crop_batch import (Manifest, init_worker, pool_limits, records_threshold, result_reporter, skip_up_to_date,
+                         submit_bounded)
+
+
+class BoxTracker:
+    # Follows the object through consecutive frames of a turntable sequence. Each frame is
+    # searched only inside the previous frame's object rect grown by slack (a fraction of its
+    # size), which skips most of the thresholding and findContours work. A frame is searched
+    # in full when the object touches the edge of that region or changes size by more than
+    # max_growth. If the full search still disagrees with the track, the frame is treated as
+    # an outlier (a reflection or stray bright patch) and keeps the previous rect, unless it
+    # happens patience times in a row, in which case the object really did change.
+    def __init__(self, slack=0.25, max_growth=1.5, patience=3):
+        self.slack = slack
+        self.max_growth = max_growth
+        self.patience = patience
+        self.rect = None
+        self.outliers = 0
+
+    def search_region(self, shape):
+        x, y, w, h = self.rect
+        dx = int(w * self.slack) + 1
+        dy = int(h * self.slack) + 1
+        return max(x - dx, 0), max(y - dy, 0), min(x + w + dx, shape[1]), min(y + h + dy, shape[0])
+
+    def consistent(self, rect):
+        _, _, w, h = self.rect
+        return (w / self.max_growth <= rect[2] <= w * self.max_growth
+                and h / self.max_growth <= rect[3] <= h * self.max_growth)
+
+    def detect(self, gray, brightness_threshold, detection_scale=1, stats=None):
+        # (rect, how) where how is "tracked", "full", "outlier" or "lost" (rect is None).
+        if self.rect is not None:
+            x0, y0, x1, y1 = self.search_region(gray.shape)
+            rect = find_object(gray[y0:y1, x0:x1], brightness_threshold, detection_scale, stats)
+            if rect is not None:
+                x, y, w, h = rect
+                rect = (x + x0, y + y0, w, h)
+                touches = ((x == 0 and x0 > 0) or (y == 0 and y0 > 0)
+                           or (x + x0 + w == x1 and x1 < gray.shape[1]) or (y + y0 + h == y1 and y1 < gray.shape[0]))
+                if not touches and self.consistent(rect):
+                    self.rect = rect
+                    self.outliers = 0
+                    return rect, "tracked"
+        rect = find_object(gray, brightness_threshold, detection_scale, stats)
+        if rect is None:
+            return None, "lost"
+        if self.rect is not None and not self.consistent(rect):
+            self.outliers += 1
+            if self.outliers < self.patience:
+                return self.rect, "outlier"
+        self.rect = rect
+        self.outliers = 0
+        return rect, "full"
+
+
+def uniform_box(rect, width, height, shape):
+    # width x height box centred on rect, shifted (not shrunk) to stay inside the image.
+    x, y, w, h = rect
+    width = min(width, shape[1])
+    height = min(height, shape[0])
+    x0 = min(max(x + w // 2 - width // 2, 0), shape[1] - width)
+    y0 = min(max(y + h // 2 - height // 2, 0), shape[0] - height)
+    return x0, y0, x0 + width, y0 + height
+
+
+def track_chunk(image_paths, output_folder, brightness_threshold, margin, prefix, output_format, collect_stats=False,
+                write=True, detection_scale=1, preserve_depth=False, threshold_mode="manual",
+                threshold_percentile=50.0, strip_mb=0, source_root=None, **encode_options):
+    # Worker entry point: tracks the object through consecutive image_paths, starting with a
+    # full search. Returns [(rect, output_path, error, stats)] in order; output_path stays
+    # None when write is False (the uniform-size pass only needs the rects). Tracking works on
+    # contours, so strip_mb does not apply; the search region already bounds most of the work.
+    tracker = BoxTracker()
+    results = []
+    for image_path in image_paths:
+        stats = {} if collect_stats else None
+        rect = None
+        output_path = None
+        error = None
+        try:
+            image = load_image(image_path, stats, preserve_depth)
+            if image is None:
+                raise ValueError(f"Could not read {image_path}")
+            gray, threshold = gray_and_threshold(image, brightness_threshold, stats, threshold_mode,
+                                                 threshold_percentile)
+            rect, how = tracker.detect(gray, threshold, detection_scale, stats)
+            if stats is not None:
+                stats["tracking"] = how
+            if how == "outlier":
+                print(f"Object in {image_path} is far off the track; reusing the previous box.")
+            if rect is None:
+                print(f"No bright object found in {image_path}. Skipping.")
+            elif write:
+                output_path = output_path_for(image_path, output_folder, prefix, output_format, source_root)
+                save_crop(image_path, output_path, image, apply_margin(rect, margin, gray.shape), stats,
+                          **encode_options)
+                print(f"Saved cropped image to {output_path}")
+        except Exception as e:
+            error = str(e)
+            print(f"Failed to process {image_path}: {e}")
+        results.append((rect, output_path, error, stats))
+    return results
+
+
+def crop_fixed(image_path, output_folder, prefix, output_format, rect, width, height, collect_stats=False,
+               preserve_depth=False, source_root=None, **encode_options):
+    # Worker entry point for the uniform-size pass: (output_path, stats).
+    stats = {} if collect_stats else None
+    image = load_image(image_path, stats, preserve_depth)
+    if image is None:
+        raise ValueError(f"Could not read {image_path}")
+    output_path = output_path_for(image_path, output_folder, prefix, output_format, source_root)
+    save_crop(image_path, output_path, image, uniform_box(rect, width, height, image.shape), stats, **encode_options)
+    print(f"Saved cropped image to {output_path}")
+    return output_path, stats
+
+
+class SequenceProcessor:
+    # Batch engine for turntable sequences: each worker process tracks the object through a
+    # run of chunk_size consecutive frames with BoxTracker. With uniform_crop, a first pass
+    # only tracks, and every frame is then cut to the same size (the largest object plus
+    # margin), centred on its own object, as photogrammetry tools prefer. That size depends
+    # on the whole set, so uniform runs always process every frame. Same run() interface as
+    # BatchProcessor; on_result is called per frame as each chunk finishes.
+    def __init__(self, workers=0, max_in_flight=0, chunk_size=16, uniform_crop=False):
+        self.workers, self.max_in_flight = pool_limits(workers, max_in_flight)
+        self.chunk_size = max(1, chunk_size)
+        self.uniform_crop = uniform_crop
+        self.skipped = 0
+
+    def run(self, image_paths, output_folder, brightness_threshold, margin, prefix, output_format,
+            on_result=None, cancel_event=None, incremental=False, on_status=None, status_interval=0.5,
+            run_stats=None, **options):
+        if options.get("strip_mb"):
+            print("strip_mb does not apply to the sequence engine; frames are tracked on the whole gray frame.")
+        manifest = Manifest(output_folder) if incremental else None
+        params = Manifest.params(brightness_threshold, margin, prefix, output_format, tracking=True,
+                                 uniform_crop=self.uniform_crop, **options)
+        if self.uniform_crop:
+            work, self.skipped = list(enumerate(image_paths)), 0
+        else:
+            work, self.skipped = skip_up_to_date(manifest, image_paths, params, on_result)
+        collect_stats = run_stats is not None or records_threshold(options)
+        finish = result_reporter(manifest, params, run_stats, on_result)
+
+        chunks = [work[start:start + self.chunk_size] for start in range(0, len(work), self.chunk_size)]
+        args = (output_folder, brightness_threshold, margin, prefix, output_format)
+        processed = self.skipped
+        tracked = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker) as executor:
+                def on_chunk(chunk, future):
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        print(f"Failed to process {chunk[0][1]} and the following frames: {e}")
+                        results = [(None, None, str(e), None)] * len(chunk)
+                    for (index, image_path), (rect, output_path, error, stats) in zip(chunk, results):
+                        if self.uniform_crop and rect is not None and error is None:
+                            tracked.append((index, image_path, rect, stats))
+                        else:
+                            finish(index, image_path, output_path, error, stats)
+                    return len(chunk)
+
+                processed += submit_bounded(
+                    chunks, lambda chunk: executor.submit(
+                        track_chunk, [path for _, path in chunk], *args, collect_stats=collect_stats,
+                        write=not self.uniform_crop, **options),
+                    on_chunk, self.max_in_flight, cancel_event, on_status, status_interval)
+                if self.uniform_crop and tracked:
+                    self._write_uniform(executor, tracked, output_folder, prefix, output_format, margin,
+                                        collect_stats, options, finish, cancel_event, on_status, status_interval)
+        finally:
+            if manifest is not None:
+                manifest.close()
+        return processed
+
+    def _write_uniform(self, executor, tracked, output_folder, prefix, output_format, margin, collect_stats,
+                       options, finish, cancel_event, on_status, status_interval):
+        width = max(rect[2] for _, _, rect, _ in tracked) + 2 * margin
+        height = max(rect[3] for _, _, rect, _ in tracked) + 2 * margin
+        write_options = {key: options[key] for key in ENCODE_OPTION_KEYS + ["preserve_depth", "source_root"]
+                         if key in options}
+        # Lossless JPEG crops move the box's top-left corner onto the 8/16 px block grid, which
+        # would give each frame a slightly different size; re-encode to keep the size exact.
+        write_options["lossless_jpeg"] = False
+
+        def on_done(item, future):
+            index, image_path, rect, track_stats = item
+            output_path = None
+            error = None
+            stats = track_stats
+            try:
+                output_path, write_stats = future.result()
+                if stats is not None:
+                    # Both passes decode the frame.
+                    for key, value in write_stats.items():
+                        stats[key] = stats.get(key, 0) + value if key in ("imread", "bytes_read") else value
+            except Exception as e:
+                error = str(e)
+                print(f"Failed to process {image_path}: {e}")
+            finish(index, image_path, output_path, error, stats)
+            return 0  # Already counted by the tracking pass.
+
+        submit_bounded(tracked, lambda item: executor.submit(
+            crop_fixed, item[1], output_folder, prefix, output_format, item[2], width, height,
+            collect_stats=collect_stats, **write_options),
+            on_done, self.max_in_flight, cancel_event, on_status, status_interval)
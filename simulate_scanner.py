@@ -0,0 +1,50 @@
+# Writes synthetic OpenScan-like frames into a folder the way a scanner rig does: one after
+# another, each file written in several chunks. Used to try out watch mode locally, e.g.
+#   python crop_cli.py /tmp/scan /tmp/scan_out --watch
+#   python simulate_scanner.py /tmp/scan --count 20
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+
+
+def synthetic_frame(index, width=1200, height=800):
+    # Bright ellipse on a dark, slightly noisy background, drifting like a turntable sequence.
+    rng = np.random.default_rng(index)
+    image = rng.integers(0, 40, (height, width, 3), dtype=np.uint8)
+    center = (width // 2 + int(width * 0.1 * np.sin(index / 5.0)), height // 2)
+    axes = (width // 5, height // 3)
+    cv2.ellipse(image, center, axes, index * 7 % 180, 0, 360, (235, 235, 235), -1)
+    return image
+
+
+def write_slowly(path, data, chunks, delay):
+    with open(path, "wb") as f:
+        step = max(1, len(data) // chunks)
+        for start in range(0, len(data), step):
+            f.write(data[start:start + step])
+            f.flush()
+            time.sleep(delay)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a scanner writing frames into a folder.")
+    parser.add_argument("folder")
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between frames")
+    parser.add_argument("--chunks", type=int, default=5, help="writes per file")
+    parser.add_argument("--chunk-delay", type=float, default=0.1, help="seconds between writes")
+    parser.add_argument("--format", choices=["jpg", "png", "tif"], default="jpg")
+    args = parser.parse_args(argv)
+    os.makedirs(args.folder, exist_ok=True)
+    for index in range(args.count):
+        ok, encoded = cv2.imencode("." + args.format, synthetic_frame(index))
+        path = os.path.join(args.folder, f"scan_{index:04d}.{args.format}")
+        write_slowly(path, encoded.tobytes(), args.chunks, args.chunk_delay)
+        print(f"Wrote {path}")
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Proxy detection (detection_scale > 1) against exact full-resolution detection.
+# Run with: python -m pytest -q
+import cv2
+import numpy as np
+import pytest
+from crop_core import DEFAULT_SETTINGS, DETECTION_SCALES, find_object, find_object_rect, find_object_rect_proxy
+from simulate_scanner import synthetic_frame
+
+PROXY_SCALES = [scale for scale in DETECTION_SCALES if scale > 1]
+
+
+def edge_error(rect, expected):
+    x, y, w, h = rect
+    ex, ey, ew, eh = expected
+    return max(abs(x - ex), abs(y - ey), abs(x + w - ex - ew), abs(y + h - ey - eh))
+
+
+def ellipse_frame(rng, width, height):
+    gray = (rng.random((height, width)) * 150).astype(np.uint8)
+    axes = (int(rng.integers(width // 8, width // 3)), int(rng.integers(height // 8, height // 3)))
+    cv2.ellipse(gray, (width // 2, height // 2), axes, float(rng.random() * 180), 0, 360, 230, -1)
+    return gray
+
+
+@pytest.mark.parametrize("scale", PROXY_SCALES)
+def test_proxy_matches_full_resolution_on_scanner_frames(scale):
+    for index in range(6):
+        gray = cv2.cvtColor(synthetic_frame(index, 1200, 800), cv2.COLOR_BGR2GRAY)
+        expected = find_object_rect(gray, 200)
+        assert edge_error(find_object_rect_proxy(gray, 200, scale), expected) <= 1
+
+
+@pytest.mark.parametrize("scale", PROXY_SCALES)
+def test_proxy_matches_full_resolution_on_random_objects(scale):
+    rng = np.random.default_rng(scale)
+    for _ in range(50):
+        gray = ellipse_frame(rng, int(rng.integers(200, 900)), int(rng.integers(200, 900)))
+        expected = find_object_rect(gray, 200)
+        assert edge_error(find_object_rect_proxy(gray, 200, scale), expected) <= 1
+
+
+@pytest.mark.parametrize("scale", PROXY_SCALES)
+def test_proxy_ignores_speck_next_to_object(scale):
+    # A 2x2 speck a few pixels off each side merges into the object on the proxy.
+    rng = np.random.default_rng(10 + scale)
+    for side in range(4):
+        gray = ellipse_frame(rng, 600, 500)
+        x, y, w, h = find_object_rect(gray, 200)
+        speck = [(x + w + 2, y + h // 2), (x - 4, y + h // 2), (x + w // 2, y + h + 2), (x + w // 2, y - 4)][side]
+        cv2.rectangle(gray, speck, (speck[0] + 1, speck[1] + 1), 230, -1)
+        expected = find_object_rect(gray, 200)
+        assert expected == (x, y, w, h)
+        assert edge_error(find_object_rect_proxy(gray, 200, scale), expected) <= 1
+
+
+def test_default_detection_is_exact():
+    rng = np.random.default_rng(0)
+    gray = ellipse_frame(rng, 800, 600)
+    for _ in range(40):
+        x, y = int(rng.integers(0, 800)), int(rng.integers(0, 600))
+        cv2.rectangle(gray, (x, y), (x + 2, y + 2), 230, -1)
+    assert find_object(gray, 200, DEFAULT_SETTINGS["detection_scale"]) == find_object_rect(gray, 200)
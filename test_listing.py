@@ -0,0 +1,30 @@
+# Cached folder listing (list_images).
+# Run with: python -m pytest -q
+import os
+import time
+import crop_core
+from crop_core import list_images
+
+
+def test_file_added_in_same_timestamp_tick_is_listed(tmp_path):
+    # Coarse directory timestamps: adding b.png leaves the folder's mtime unchanged.
+    (tmp_path / "a.png").touch()
+    mtime = os.stat(tmp_path).st_mtime_ns
+    assert list_images(str(tmp_path)) == [str(tmp_path / "a.png")]
+    (tmp_path / "b.png").touch()
+    os.utime(tmp_path, ns=(mtime, mtime))
+    assert list_images(str(tmp_path)) == [str(tmp_path / "a.png"), str(tmp_path / "b.png")]
+
+
+def test_quiet_folder_listing_is_cached(tmp_path, monkeypatch):
+    (tmp_path / "scan_10.png").touch()
+    (tmp_path / "scan_2.png").touch()
+    old = time.time_ns() - 10 * 10 ** 9
+    os.utime(tmp_path, ns=(old, old))
+    scans = []
+    scan_folder = crop_core._scan_folder
+    monkeypatch.setattr(crop_core, "_scan_folder", lambda *args: scans.append(args) or scan_folder(*args))
+    expected = [str(tmp_path / "scan_2.png"), str(tmp_path / "scan_10.png")]
+    assert list_images(str(tmp_path)) == expected
+    assert list_images(str(tmp_path)) == expected
+    assert len(scans) == 1
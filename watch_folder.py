@@ -0,0 +1,87 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from crop_core import list_images
+from crop_batch import Manifest, init_worker, pool_limits, process_with_stats, records_threshold
+
+
+class FolderWatcher:
+    # Polls a folder the scanner is writing into and crops each image once it is complete.
+    # A file counts as complete when its size and mtime have not changed for settle_time
+    # seconds. At most max_in_flight images are being cropped at once; further ready files
+    # wait in a queue (backpressure), so a burst from the scanner can't exhaust memory.
+    def __init__(self, input_folder, output_folder, brightness_threshold, margin, prefix, output_format,
+                 workers=0, max_in_flight=0, poll_interval=0.5, settle_time=1.0, **options):
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        # crop_options only sets source_root for recursive runs, so subfolders are watched too.
+        self.recursive = options.get("source_root") is not None
+        self.args = (output_folder, brightness_threshold, margin, prefix, output_format)
+        self.options = dict(options, collect_stats=records_threshold(options))
+        self.params = Manifest.params(brightness_threshold, margin, prefix, output_format, **options)
+        self.workers, self.max_in_flight = pool_limits(workers, max_in_flight)
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.candidates = {}  # path -> ((size, mtime), first time that signature was seen)
+        self.handled = {}  # path -> (size, mtime) already queued or skipped
+        self.ready = deque()
+        self.processed = 0
+
+    def scan(self, manifest):
+        now = time.monotonic()
+        for path in list_images(self.input_folder, self.recursive, [self.output_folder]):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # Deleted or renamed between listing and stat.
+            signature = (st.st_size, st.st_mtime_ns)
+            if self.handled.get(path) == signature:
+                continue
+            seen = self.candidates.get(path)
+            if seen is None or seen[0] != signature:
+                self.candidates[path] = (signature, now)
+                continue
+            if st.st_size == 0 or now - seen[1] < self.settle_time:
+                continue
+            del self.candidates[path]
+            self.handled[path] = signature
+            if not manifest.is_up_to_date(path, self.params):
+                self.ready.append(path)
+
+    def run(self, stop_event, on_result=None):
+        # Blocks until stop_event is set, then finishes the images already being cropped.
+        # on_result(image_path, output_path, error) is called from this thread.
+        os.makedirs(self.output_folder, exist_ok=True)
+        manifest = Manifest(self.output_folder)
+        pending = {}
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker) as executor:
+                while not stop_event.is_set() or pending:
+                    if not stop_event.is_set():
+                        self.scan(manifest)
+                        while self.ready and len(pending) < self.max_in_flight:
+                            image_path = self.ready.popleft()
+                            future = executor.submit(process_with_stats, image_path, *self.args, **self.options)
+                            pending[future] = image_path
+                    if not pending:
+                        stop_event.wait(self.poll_interval)
+                        continue
+                    done, _ = wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        image_path = pending.pop(future)
+                        output_path = None
+                        error = None
+                        try:
+                            output_path, stats = future.result()
+                            manifest.record(image_path, self.params, output_path,
+                                            (stats or {}).get("brightness_threshold"))
+                        except Exception as e:
+                            error = str(e)
+                            print(f"Failed to process {image_path}: {e}")
+                        self.processed += 1
+                        if on_result is not None:
+                            on_result(image_path, output_path, error)
+        finally:
+            manifest.close()
+        return self.processed